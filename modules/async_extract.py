@@ -0,0 +1,208 @@
+import asyncio
+import atexit
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Tuple, Union
+
+from modules.html_to_json import extract_serp
+from modules.limits import DEFAULT_LIMITS, ParseLimits
+from modules.metrics import record_page
+
+# Seconds a worker may run past a page's deadline before the page is given up on
+TIMEOUT_GRACE = 5.0
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Return the shared process pool used to offload parsing
+
+    The pool is created lazily on first use and reused afterwards. Passing
+    max_workers only has an effect when the pool does not exist yet.
+
+    Args:
+        max_workers: Number of worker processes (defaults to the CPU count)
+
+    Returns:
+        The shared ProcessPoolExecutor
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1)
+    return _executor
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    """Shut down the shared process pool (a new one is created on next use)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
+
+
+atexit.register(shutdown_executor, wait=False)
+
+
+def _extract_with_stats(html_content: str, limits: ParseLimits) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Run extract_serp in a worker, returning its stats for the parent to record"""
+    stats = {}
+    serp_data = extract_serp(html_content, limits, stats=stats)
+    return serp_data, stats
+
+
+def _submit(html_content: str, timeout: Optional[float], executor: Optional[Executor]) -> asyncio.Future:
+    """Start extracting a page in the pool, with its deadline enforced by the worker"""
+    # The worker's clock starts when it picks the page up, so time spent
+    # queued in the pool does not count against the page
+    limits = DEFAULT_LIMITS if timeout is None else replace(DEFAULT_LIMITS, max_seconds=timeout)
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(executor or get_executor(), _extract_with_stats, html_content, limits)
+
+
+async def _result(future: asyncio.Future, html_content: str, timeout: Optional[float]) -> Dict[str, Any]:
+    """Wait for a submitted page and record its stats (timeouts and failures as status "error")"""
+    try:
+        if timeout is None:
+            serp_data, stats = await future
+        else:
+            # Shielded: giving up on the page must not mark the worker as free
+            serp_data, stats = await asyncio.wait_for(asyncio.shield(future), timeout + TIMEOUT_GRACE)
+    except Exception:
+        bytes_in = len(html_content.encode('utf-8')) if isinstance(html_content, str) else 0
+        record_page({"status": "error", "bytes_in": bytes_in})
+        raise
+    record_page(stats)
+    return serp_data
+
+
+async def aextract_serp(html_content: str,
+                        timeout: Optional[float] = None,
+                        executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    Extract structured data from a SERP without blocking the event loop
+
+    Parsing runs in a process pool so CPU-bound work does not stall the
+    caller's event loop. Page stats are recorded in this process's metrics.
+
+    The timeout is the page's wall time budget inside the worker: a page
+    exceeding it returns a partial result (see modules.limits). Only a worker
+    still busy TIMEOUT_GRACE seconds later is given up on.
+
+    Args:
+        html_content: HTML content of the SERP page
+        timeout: Processing time budget of the page in seconds
+        executor: Executor to run the extraction in (defaults to the shared pool)
+
+    Returns:
+        Dictionary containing structured SERP data
+
+    Raises:
+        asyncio.TimeoutError: If the worker does not return within the grace period
+        Exception: Whatever extract_serp raised in the worker
+    """
+    return await _result(_submit(html_content, timeout, executor), html_content, timeout)
+
+
+async def _aiter(source: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+    """Iterate over a sync or async iterable of HTML pages"""
+    if hasattr(source, '__aiter__'):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+
+def _error_result(message: str) -> Dict[str, Any]:
+    """Build the result returned for a page that could not be extracted"""
+    return {
+        "search_metadata": {
+            "status": "error",
+            "errors": [message],
+            "parsed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    }
+
+
+async def aextract_many(source: Union[Iterable[str], AsyncIterable[str]],
+                        concurrency: Optional[int] = None,
+                        timeout: Optional[float] = None,
+                        ordered: bool = True,
+                        executor: Optional[Executor] = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Extract many SERPs concurrently, yielding results as they become available
+
+    At most `concurrency` pages are parsed at the same time and at most twice
+    that many are read ahead from source, so memory stays bounded for long
+    inputs. Pages exceeding the timeout yield a partial result, or an error
+    result if their worker does not return in time; pages whose extraction
+    raises yield an error result with the exception. Neither aborts the
+    batch. A concurrency slot is only freed once its worker is, so a stuck
+    page never makes later pages wait in the pool queue. Closing or
+    cancelling the iterator cancels all pages still queued.
+
+    Args:
+        source: Iterable or async iterable of HTML pages
+        concurrency: Maximum number of pages parsed at once (defaults to the CPU
+            count, capped at the pool size)
+        timeout: Per-page processing time budget in seconds
+        ordered: Yield results in input order (otherwise in completion order)
+        executor: Executor to run the extraction in (defaults to the shared pool)
+
+    Yields:
+        Tuples of (input index, SERP data)
+    """
+    executor = executor or get_executor()
+    limit = concurrency or os.cpu_count() or 1
+    # More pages in flight than workers would only queue inside the pool
+    limit = min(limit, getattr(executor, '_max_workers', limit))
+    window = 2 * limit
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(index: int, html_content: str) -> Tuple[int, Dict[str, Any]]:
+        await semaphore.acquire()
+        future = _submit(html_content, timeout, executor)
+        future.add_done_callback(lambda _: semaphore.release())
+        try:
+            return index, await _result(future, html_content, timeout)
+        except asyncio.TimeoutError:
+            return index, _error_result(f"extraction timed out after {timeout + TIMEOUT_GRACE}s")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            return index, _error_result(f"extraction failed: {e!r}")
+
+    pending = deque() if ordered else set()
+    try:
+        index = 0
+        async for html_content in _aiter(source):
+            task = asyncio.ensure_future(run(index, html_content))
+            index += 1
+            if ordered:
+                pending.append(task)
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            else:
+                pending.add(task)
+                if len(pending) >= window:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+
+        while pending:
+            if ordered:
+                yield await pending.popleft()
+            else:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
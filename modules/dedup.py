@@ -0,0 +1,236 @@
+import hashlib
+import re
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from lxml import etree, html as lxml_html
+
+from modules.html_to_json import extract_serp
+from modules.stream_extract import stream_organic_results
+from modules.urls import normalize_url
+
+FINGERPRINT_BITS = 64
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# Links identify a result far better than a snippet word
+LINK_WEIGHT = 4
+TITLE_WEIGHT = 2
+SECTION_WEIGHT = 2
+SHINGLE_WEIGHT = 1
+
+_SPACES = re.compile(r'\s+')
+
+
+def _class_xpath(*classes: str) -> str:
+    return " or ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in classes)
+
+
+# Same elements as extract_related_searches, extract_related_questions and
+# extract_knowledge_graph select
+_RELATED_SEARCHES = etree.XPath(f"//div[{_class_xpath('oIk2Cb', 'AuVD')}]//a")
+_RELATED_QUESTIONS = etree.XPath('//div[@jsname="yEVEwb"]/descendant::span[1]')
+_KNOWLEDGE_GRAPH_TITLE = etree.XPath(
+    f"(//*[{_class_xpath('kp-wholepage', 'knowledge-panel')}])[1]"
+    f"/descendant::*[self::h2 or {_class_xpath('garHBe')}][1]"
+)
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _normalized_text(text: Optional[str]) -> str:
+    return _SPACES.sub(' ', text or '').strip().lower()
+
+
+def _text(element) -> str:
+    return _normalized_text(element.text_content())
+
+
+def page_features(html_content: str) -> Tuple[str, Dict[str, int]]:
+    """
+    Collect the query key and weighted features of a SERP from a cheap lxml pass
+
+    Features are the normalized result links and titles, tagged with their
+    position so a reordered ranking gives a different fingerprint, word
+    3-shingles of the snippets, the related searches and questions and the
+    knowledge graph title; volatile ids and tracking tokens do not
+    contribute.
+
+    Args:
+        html_content: HTML content of the SERP page
+
+    Returns:
+        Tuple of (normalized page title, dictionary mapping each feature to its weight)
+    """
+    features: Dict[str, int] = {}
+
+    def add(feature: str, weight: int) -> None:
+        features[feature] = features.get(feature, 0) + weight
+
+    for result in stream_organic_results(html_content, parser="lxml"):
+        position = result["position"]
+        add(f"link@{position}:" + normalize_url(result["link"]), LINK_WEIGHT)
+        add(f"title@{position}:" + _normalized_text(result["title"]), TITLE_WEIGHT)
+        words = _WORD.findall(result["snippet"].lower())
+        for i in range(len(words) - 2):
+            add("text:" + " ".join(words[i:i + 3]), SHINGLE_WEIGHT)
+
+    if not html_content.strip():
+        return "", features
+    tree = lxml_html.fromstring(html_content)
+    title = tree.find('.//title')
+    for element in _RELATED_SEARCHES(tree):
+        add("search:" + _text(element), SECTION_WEIGHT)
+    for element in _RELATED_QUESTIONS(tree):
+        add("question:" + _text(element), SECTION_WEIGHT)
+    for element in _KNOWLEDGE_GRAPH_TITLE(tree):
+        add("kg:" + _text(element), SECTION_WEIGHT)
+    return (_text(title) if title is not None else ""), features
+
+
+def simhash(features: Dict[str, int]) -> Optional[int]:
+    """
+    Compute the 64-bit SimHash of weighted features
+
+    Args:
+        features: Dictionary mapping each feature to its weight
+
+    Returns:
+        The fingerprint, or None when there are no features to compare
+    """
+    if not features:
+        return None
+    totals = [0] * FINGERPRINT_BITS
+    for feature, weight in features.items():
+        value = _feature_hash(feature)
+        for bit in range(FINGERPRINT_BITS):
+            if value >> bit & 1:
+                totals[bit] += weight
+            else:
+                totals[bit] -= weight
+    fingerprint = 0
+    for bit, total in enumerate(totals):
+        if total > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def page_fingerprint(html_content: str) -> Tuple[str, Optional[int]]:
+    """Return the query key and SimHash of a SERP (None for pages without features)"""
+    query, features = page_features(html_content)
+    return query, simhash(features)
+
+
+class SimHashIndex:
+    """
+    LSH index grouping fingerprints within max_distance bits of each other
+
+    Fingerprints are split into max_distance + 1 bands: two fingerprints that
+    differ in at most max_distance bits share at least one band exactly, so
+    only pages sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self.bands = [
+            (i * width, FINGERPRINT_BITS if i == bands - 1 else (i + 1) * width)
+            for i in range(bands)
+        ]
+        self.buckets: List[Dict[int, List[Tuple[Hashable, int]]]] = [{} for _ in self.bands]
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        return [fingerprint >> start & ((1 << (end - start)) - 1) for start, end in self.bands]
+
+    def find(self, fingerprint: int) -> Optional[Hashable]:
+        """Return the closest representative within max_distance, if any"""
+        best, best_distance = None, self.max_distance + 1
+        for buckets, band_key in zip(self.buckets, self._band_keys(fingerprint)):
+            for key, candidate in buckets.get(band_key, ()):
+                distance = bin(fingerprint ^ candidate).count('1')
+                if distance < best_distance:
+                    best, best_distance = key, distance
+        return best
+
+    def add(self, key: Hashable, fingerprint: int) -> Hashable:
+        """
+        Add a page, returning the representative of its cluster
+
+        Args:
+            key: Identifier of the page
+            fingerprint: SimHash of the page
+
+        Returns:
+            The key of a near-duplicate representative, or key itself if the
+            page starts a new cluster
+        """
+        representative = self.find(fingerprint)
+        if representative is not None:
+            return representative
+        for buckets, band_key in zip(self.buckets, self._band_keys(fingerprint)):
+            buckets.setdefault(band_key, []).append((key, fingerprint))
+        return key
+
+
+class _QueryIndex:
+    """SimHash indexes keyed by normalized query: only pages of the same query can merge"""
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self.indexes: Dict[str, SimHashIndex] = {}
+
+    def representative(self, key: Hashable, html_content: str) -> Hashable:
+        """Fingerprint a page and add it (pages without features stay unique)"""
+        query, fingerprint = page_fingerprint(html_content)
+        if fingerprint is None:
+            return key
+        index = self.indexes.get(query)
+        if index is None:
+            index = self.indexes[query] = SimHashIndex(self.max_distance)
+        return index.add(key, fingerprint)
+
+
+def find_duplicates(pages: Iterable[Tuple[Hashable, str]], max_distance: int = 3) -> Dict[Hashable, Hashable]:
+    """
+    Group near-duplicate SERPs
+
+    Pages only merge when their normalized titles (which carry the query)
+    are equal and their fingerprints are within max_distance bits.
+
+    Args:
+        pages: (key, html_content) pairs
+        max_distance: Maximum number of differing fingerprint bits
+
+    Returns:
+        Dictionary mapping every page key to the key of its representative
+    """
+    index = _QueryIndex(max_distance)
+    return {key: index.representative(key, html_content) for key, html_content in pages}
+
+
+def extract_deduplicated(pages: Iterable[Tuple[Hashable, str]],
+                         max_distance: int = 3) -> Tuple[Dict[Hashable, Dict[str, Any]], Dict[Hashable, Hashable]]:
+    """
+    Run extract_serp once per cluster of near-duplicate pages
+
+    Pages are fingerprinted as they arrive; only the first page of each
+    cluster goes through full extraction.
+
+    Args:
+        pages: (key, html_content) pairs
+        max_distance: Maximum number of differing fingerprint bits
+
+    Returns:
+        Tuple of (SERP data per representative key, representative key per page key)
+    """
+    index = _QueryIndex(max_distance)
+    serps = {}
+    representatives = {}
+    for key, html_content in pages:
+        representative = index.representative(key, html_content)
+        representatives[key] = representative
+        if representative == key:
+            serps[key] = extract_serp(html_content)
+    return serps, representatives
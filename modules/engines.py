@@ -0,0 +1,173 @@
+import re
+from typing import Dict, List, Optional
+
+DEFAULT_ENGINE = "google"
+
+# Hints are looked for in the first SNIFF_SIZE characters only (host hints
+# within the <head> part of them)
+SNIFF_SIZE = 16384
+
+# Evidence per engine, from strongest to weakest. Result links and the page
+# title quote the user's query and other sites, so apart from the engines'
+# fixed title suffixes they are never looked at.
+_STRUCTURE_WEIGHT = 3
+_HEAD_WEIGHT = 2
+_TITLE_WEIGHT = 1
+
+# Marker ids and classes, and form actions
+_MARKER_IDS = {
+    "rso": "google", "searchform": "google", "botstuff": "google", "tsf": "google",
+    "b_results": "bing", "b_content": "bing", "b_header": "bing", "sb_form": "bing",
+    "web": "yahoo",
+    "links": "duckduckgo",
+}
+_MARKER_CLASSES = {
+    "searchCenterMiddle": "yahoo",
+    "results--main": "duckduckgo",
+    "result__a": "duckduckgo",
+}
+_FORM_ACTIONS = re.compile(
+    r'(?P<yahoo>https://search\.yahoo\.com/search)'
+    r'|(?P<duckduckgo>(?:https:)?//(?:html\.)?duckduckgo\.com/)'
+)
+
+# Hosts referenced from the <head> (canonical link, icons, scripts)
+_HEAD_HOSTS = re.compile(
+    r'(?P<google>www\.google\.[a-z.]+|(?:[\w-]+\.)*gstatic\.com)'
+    r'|(?P<bing>www\.bing\.com|(?:[\w-]+\.)*bing\.net)'
+    r'|(?P<yahoo>search\.yahoo\.com|(?:[\w-]+\.)*yimg\.com)'
+    r'|(?P<duckduckgo>(?:html\.|links\.)?duckduckgo\.com)'
+)
+
+# Suffixes the engines append to the query in the title
+_TITLE_SUFFIXES = re.compile(
+    r'.* - (?:(?P<google>Google Search)|(?P<yahoo>Yahoo Search(?: Results)?))'
+    r'|.* at (?P<duckduckgo>DuckDuckGo)'
+)
+
+# Regexes without a literal prefix are slow in re, so attributes and hosts
+# are found with cheap patterns and classified afterwards
+_ATTRIBUTE = re.compile(r'\s(id|class|action)="([^"]*)"')
+_HOST_REFERENCE = re.compile(r'//([\w.-]+)')
+_TITLE_ELEMENT = re.compile(r'<title[^>]*>([^<]*)</title>', re.IGNORECASE)
+
+# Result container ids looked up in the whole page (plain substring search)
+# when the first SNIFF_SIZE characters give no hint
+_CONTAINER_MARKERS = {
+    "google": ['id="rso"'],
+    "bing": ['id="b_results"'],
+    "yahoo": ['id="web"'],
+    "duckduckgo": ['id="links"'],
+}
+
+# Main content containers per engine, used by clean_serp_html
+CONTAINER_SELECTORS: Dict[str, List[str]] = {
+    "google": ['div.g', 'div.rc', 'div.related-question', 'div.knowledge-panel',
+               'div.bkWMgd', 'div.ULSxyf', 'div#search'],
+    "bing": ['li.b_algo', 'ol#b_results'],
+    "yahoo": ['div.algo', 'div#web'],
+    "duckduckgo": ['div.result', 'div#results'],
+}
+
+# Selectors of every engine, in the order tried when the engine is unknown
+ALL_CONTAINER_SELECTORS = [
+    'div.g', 'div.rc', 'li.b_algo', 'div.result', 'div.algo',  # Standard results
+    'div.related-question', 'div.knowledge-panel',  # Knowledge panels
+    'div.bkWMgd', 'div.ULSxyf', 'div#search',  # Google containers
+    'ol#b_results', 'div#results', 'div#web'  # Bing/Yahoo/DDG containers
+]
+
+
+def _structure_hints(text: str) -> Dict[str, set]:
+    """Distinct marker ids, classes and form actions per engine"""
+    hints: Dict[str, set] = {}
+    for match in _ATTRIBUTE.finditer(text):
+        attribute, value = match.groups()
+        if attribute == 'id':
+            markers = [(_MARKER_IDS.get(value), value)]
+        elif attribute == 'class':
+            markers = [(_MARKER_CLASSES.get(name), name) for name in value.split()]
+        else:
+            action = _FORM_ACTIONS.match(value)
+            markers = [(action.lastgroup if action else None, value)]
+        for engine, marker in markers:
+            if engine:
+                hints.setdefault(engine, set()).add((attribute, marker))
+    return hints
+
+
+def _head_hints(text: str) -> Dict[str, set]:
+    """Distinct engine hosts referenced per engine"""
+    hints: Dict[str, set] = {}
+    for host in _HOST_REFERENCE.findall(text):
+        match = _HEAD_HOSTS.fullmatch(host.lower())
+        if match:
+            hints.setdefault(match.lastgroup, set()).add(host)
+    return hints
+
+
+def detect_engine(html_content: str) -> Optional[str]:
+    """
+    Detect which search engine produced a result page
+
+    Engines are scored on distinct hints in the first SNIFF_SIZE characters:
+    marker ids, classes and form actions weigh most, hosts referenced from
+    the <head> less, and the engine's suffix in the title least. Result links
+    and the query itself are never matched, so a Bing page about Google stays
+    a Bing page. Only if the start of the page gives no hint is the rest
+    searched, for the engines' result container ids.
+
+    Args:
+        html_content: HTML content of the SERP page
+
+    Returns:
+        "google", "bing", "yahoo", "duckduckgo", or None if unknown
+    """
+    prefix = html_content[:SNIFF_SIZE]
+    scores: Dict[str, int] = {}
+    for engine, hints in _structure_hints(prefix).items():
+        scores[engine] = scores.get(engine, 0) + _STRUCTURE_WEIGHT * len(hints)
+
+    head_end = prefix.find('</head>')
+    head = prefix[:head_end] if head_end != -1 else prefix
+    title = _TITLE_ELEMENT.search(head)
+    if title:
+        suffix = _TITLE_SUFFIXES.fullmatch(title.group(1).strip())
+        if suffix:
+            scores[suffix.lastgroup] = scores.get(suffix.lastgroup, 0) + _TITLE_WEIGHT
+        head = head[:title.start()] + head[title.end():]
+    for engine, hints in _head_hints(head).items():
+        scores[engine] = scores.get(engine, 0) + _HEAD_WEIGHT * len(hints)
+
+    if not scores:
+        for engine, markers in _CONTAINER_MARKERS.items():
+            found = sum(1 for marker in markers if marker in html_content)
+            if found:
+                scores[engine] = found
+    return max(scores, key=scores.get) if scores else None
+
+
+def normalize_engine(engine: Optional[str]) -> Optional[str]:
+    """
+    Return the canonical name of an engine given by the caller
+
+    Args:
+        engine: Engine name in any case (None stays None)
+
+    Returns:
+        "google", "bing", "yahoo" or "duckduckgo"
+
+    Raises:
+        ValueError: If the engine is not supported
+    """
+    if engine is None:
+        return None
+    name = engine.strip().lower()
+    if name not in CONTAINER_SELECTORS:
+        raise ValueError(f"unknown engine: {engine}")
+    return name
+
+
+def container_selectors(engine: Optional[str]) -> List[str]:
+    """Return the main content selectors to try for an engine (all if unknown)"""
+    return CONTAINER_SELECTORS.get(engine and engine.lower(), ALL_CONTAINER_SELECTORS)
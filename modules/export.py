@@ -0,0 +1,231 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pc = pq = None
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from modules.urls import normalize_urls, url_domains
+
+# Columns of every exported table, in order
+TABLE_COLUMNS = {
+    "organic_results": [
+        "page_id", "position", "source", "title", "date", "link", "displayed_link",
+        "redirect_link", "snippet", "snippet_highlighted_words",
+    ],
+    "related_searches": ["page_id", "position", "name", "link"],
+    "related_questions": ["page_id", "position", "question"],
+    "sitelinks_inline": ["page_id", "position", "sitelink_position", "title", "link"],
+    "sitelinks_expanded": ["page_id", "position", "sitelink_position", "title", "link", "snippet"],
+}
+
+# Link columns that get derived domain / normalized columns
+LINK_COLUMNS = {
+    "organic_results": ["link", "redirect_link"],
+    "related_searches": [],
+    "related_questions": [],
+    "sitelinks_inline": ["link"],
+    "sitelinks_expanded": ["link"],
+}
+
+INTEGER_COLUMNS = {"position", "sitelink_position"}
+
+def flatten_serps(serps: Iterable[Dict[str, Any]],
+                  page_ids: Optional[Iterable[Any]] = None) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    Flatten extracted SERPs into one set of columns per section
+
+    Args:
+        serps: Extracted SERP dictionaries (as returned by extract_serp)
+        page_ids: Identifier of each page (defaults to its index in serps)
+
+    Returns:
+        Dictionary mapping each section to a dictionary of column lists
+    """
+    tables = {name: {column: [] for column in columns} for name, columns in TABLE_COLUMNS.items()}
+    organic = tables["organic_results"]
+    searches = tables["related_searches"]
+    questions = tables["related_questions"]
+    inline = tables["sitelinks_inline"]
+    expanded = tables["sitelinks_expanded"]
+
+    ids = iter(page_ids) if page_ids is not None else None
+    for index, serp in enumerate(serps):
+        page_id = next(ids) if ids is not None else index
+
+        for result in serp.get("organic_results", ()):
+            position = result.get("position")
+            for column in TABLE_COLUMNS["organic_results"][1:]:
+                organic[column].append(result.get(column))
+            organic["page_id"].append(page_id)
+
+            for i, sitelink in enumerate(result.get("sitelinks_inline", ()), 1):
+                inline["page_id"].append(page_id)
+                inline["position"].append(position)
+                inline["sitelink_position"].append(i)
+                inline["title"].append(sitelink.get("title"))
+                inline["link"].append(sitelink.get("link"))
+
+            for i, sitelink in enumerate(result.get("sitelinks_expanded", ()), 1):
+                expanded["page_id"].append(page_id)
+                expanded["position"].append(position)
+                expanded["sitelink_position"].append(i)
+                expanded["title"].append(sitelink.get("title"))
+                expanded["link"].append(sitelink.get("link"))
+                expanded["snippet"].append(sitelink.get("snippet"))
+
+        for i, search in enumerate(serp.get("related_searches", ()), 1):
+            searches["page_id"].append(page_id)
+            searches["position"].append(i)
+            searches["name"].append(search.get("name"))
+            searches["link"].append(search.get("link"))
+
+        for i, question in enumerate(serp.get("related_questions", ()), 1):
+            questions["page_id"].append(page_id)
+            questions["position"].append(i)
+            questions["question"].append(question)
+
+    return tables
+
+
+def _arrow_map_unique(array, function):
+    """Apply a batch URL function once per distinct value of an Arrow array"""
+    encoded = pc.dictionary_encode(array)
+    dictionary = pa.array(function(encoded.dictionary.to_pylist()), type=pa.string())
+    return pc.take(dictionary, encoded.indices)
+
+
+def to_arrow(tables: Dict[str, Dict[str, List[Any]]]) -> Dict[str, "pa.Table"]:
+    """
+    Convert flattened columns to Arrow tables with derived URL columns
+
+    For every link column, `<column>_domain` and `<column>_normalized` are
+    derived over the dictionary-encoded column, so each distinct URL is
+    processed once.
+
+    Args:
+        tables: Columns as returned by flatten_serps
+
+    Returns:
+        Dictionary mapping each section to a pyarrow.Table
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required for Arrow export")
+
+    arrow_tables = {}
+    for name, columns in tables.items():
+        arrays = {}
+        for column, values in columns.items():
+            if column in INTEGER_COLUMNS:
+                arrays[column] = pa.array(values, type=pa.int64())
+            elif column == "snippet_highlighted_words":
+                arrays[column] = pa.array(values, type=pa.list_(pa.string()))
+            elif column == "page_id":
+                arrays[column] = pa.array(values)
+            else:
+                arrays[column] = pa.array(values, type=pa.string())
+        for column in LINK_COLUMNS[name]:
+            arrays[f"{column}_domain"] = _arrow_map_unique(arrays[column], url_domains)
+            arrays[f"{column}_normalized"] = _arrow_map_unique(arrays[column], normalize_urls)
+        arrow_tables[name] = pa.table(arrays)
+    return arrow_tables
+
+
+def _numpy_map_unique(values: "np.ndarray", function) -> "np.ndarray":
+    """Apply a batch URL function once per distinct value and broadcast the results back"""
+    # Factorized through a dict: a fixed-width string array would size every
+    # row after the longest URL. None keeps its own code and maps to None, as
+    # nulls do in the Arrow backend.
+    codes: Dict[Optional[str], int] = {}
+    inverse = np.fromiter(
+        (codes.setdefault(value, len(codes)) for value in values),
+        dtype=np.intp, count=len(values),
+    )
+    mapped = np.empty(len(codes), dtype=object)
+    mapped[:] = function(list(codes))
+    return mapped[inverse]
+
+
+def to_numpy(tables: Dict[str, Dict[str, List[Any]]]) -> Dict[str, "np.recarray"]:
+    """
+    Convert flattened columns to NumPy record arrays with derived URL columns
+
+    Fallback for environments without pyarrow. URL columns are derived once
+    per distinct value, since domains and links repeat heavily across pages.
+
+    Args:
+        tables: Columns as returned by flatten_serps
+
+    Returns:
+        Dictionary mapping each section to a numpy.recarray
+    """
+    if np is None:
+        raise ImportError("numpy is required for NumPy export")
+
+    record_arrays = {}
+    for name, columns in tables.items():
+        arrays = {}
+        for column, values in columns.items():
+            array = np.empty(len(values), dtype=np.int64 if column in INTEGER_COLUMNS else object)
+            array[:] = values
+            arrays[column] = array
+        for column in LINK_COLUMNS[name]:
+            arrays[f"{column}_domain"] = _numpy_map_unique(arrays[column], url_domains)
+            arrays[f"{column}_normalized"] = _numpy_map_unique(arrays[column], normalize_urls)
+        record_arrays[name] = np.rec.fromarrays(list(arrays.values()), names=list(arrays))
+    return record_arrays
+
+
+def export_serps(serps: Iterable[Dict[str, Any]],
+                 page_ids: Optional[Iterable[Any]] = None,
+                 backend: str = "auto") -> Dict[str, Any]:
+    """
+    Export a batch of extracted SERPs as one table per section
+
+    Args:
+        serps: Extracted SERP dictionaries (as returned by extract_serp)
+        page_ids: Identifier of each page (defaults to its index in serps)
+        backend: "arrow", "numpy" or "auto" (Arrow if installed, else NumPy)
+
+    Returns:
+        Dictionary mapping each section to a table keyed by page_id and position
+    """
+    tables = flatten_serps(serps, page_ids)
+    if backend == "auto":
+        backend = "arrow" if pa is not None else "numpy"
+    if backend == "arrow":
+        return to_arrow(tables)
+    if backend == "numpy":
+        return to_numpy(tables)
+    raise ValueError(f"unknown backend: {backend}")
+
+
+def write_parquet(tables: Dict[str, "pa.Table"], directory: str) -> List[str]:
+    """
+    Write Arrow tables to <directory>/<section>.parquet
+
+    Args:
+        tables: Tables as returned by export_serps with the Arrow backend
+        directory: Output directory (created if missing)
+
+    Returns:
+        Paths of the written files
+    """
+    if pq is None:
+        raise ImportError("pyarrow is required for Parquet export")
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        path = os.path.join(directory, f"{name}.parquet")
+        pq.write_table(table, path)
+        paths.append(path)
+    return paths
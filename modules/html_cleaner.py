@@ -1,21 +1,108 @@
 from bs4 import BeautifulSoup
-import re
+from bs4.element import CData, NavigableString, PreformattedString
 import os
+import time
 
+from modules.engines import container_selectors, detect_engine, normalize_engine
+from modules.limits import PageGuard
+from modules.metrics import clean_seconds, record_limit_hits
+from modules.urls import normalize_url
 
-def clean_serp_html(html_content):
+
+def _has_own_text(element):
+    """Return True if one of the element's direct strings contains visible text"""
+    for child in element.contents:
+        if isinstance(child, NavigableString):
+            if (not isinstance(child, PreformattedString) or isinstance(child, CData)) and child.strip():
+                return True
+    return False
+
+
+def remove_empty_elements(soup):
+    """
+    Remove elements without text, images or inputs (except br, hr and links)
+
+    Text and media presence are computed bottom-up in a single pass, so the
+    cost is linear in the number of elements instead of calling get_text on
+    every subtree.
+
+    Args:
+        soup (BeautifulSoup): Parsed document, modified in place
+    """
+    elements = soup.find_all()
+    has_text = {}
+    has_media = {}
+    for element in reversed(elements):
+        text = _has_own_text(element)
+        media = False
+        for child in element.contents:
+            key = id(child)
+            if key in has_text:
+                text = text or has_text[key]
+                media = media or has_media[key] or child.name in ('img', 'input')
+        has_text[id(element)] = text
+        has_media[id(element)] = media
+
+    # Decide before mutating: descendants of a removed element go with it
+    removed = set()
+    to_remove = []
+    for element in elements:
+        key = id(element)
+        if id(element.parent) in removed:
+            removed.add(key)
+        elif not has_text[key] and not has_media[key] and element.name not in ['br', 'hr']:
+            if not (element.name == 'a' and element.has_attr('href')):  # Keep links with hrefs
+                removed.add(key)
+                to_remove.append(element)
+
+    for element in to_remove:
+        element.decompose()
+
+
+def clean_serp_html(html_content, limits=None, engine=None, errors=None):
     """
     Clean a search engine result page HTML, removing unnecessary elements
     while preserving important search result content.
 
+    Pages breaking one of the limits are cut short or only partially
+    cleaned. The reasons are appended to errors when a list is passed (an
+    empty list afterwards means the page was fully cleaned), and the limit
+    hits are counted in modules.metrics.
+
     Args:
         html_content (str): Raw HTML content of a SERP
+        limits (ParseLimits, optional): Resource limits for the page
+                                        (defaults to DEFAULT_LIMITS)
+        engine (str, optional): Search engine of the page (detected if not
+                                given, in any case); only its container
+                                selectors are tried
+        errors (list, optional): List to append limit errors to
 
     Returns:
         str: Cleaned HTML containing only essential SERP information
+
+    Raises:
+        ValueError: If engine is not a supported search engine
     """
+    started = time.perf_counter()
+    engine = normalize_engine(engine) or detect_engine(html_content)
+    guard = PageGuard(limits)
+    clean_html = _clean_serp_html(html_content, guard, engine)
+    clean_seconds.observe(time.perf_counter() - started)
+    record_limit_hits(guard.hits)
+    if errors is not None:
+        errors.extend(guard.errors)
+    return clean_html
+
+
+def _clean_serp_html(html_content, guard, engine):
+    """Clean a SERP HTML within the limits tracked by guard"""
+    html_content = guard.prescan(html_content)
+
     # Create BeautifulSoup object for parsing
     soup = BeautifulSoup(html_content, 'html.parser')
+    if guard.expired():
+        return soup.prettify()
 
     # Remove script, style and other non-essential elements
     for element in soup.select('script, style, iframe, noscript, svg, img[width="1"], meta, link'):
@@ -44,35 +131,16 @@ def clean_serp_html(html_content):
             if attr not in allowed_attrs:
                 del element[attr]
 
-        # Clean href attributes from tracking parameters
+        # Resolve Google redirects and remove tracking parameters
         if element.has_attr('href'):
-            href = element['href']
-            # Clean Google redirect URLs
-            if href.startswith('/url?') or 'google' in href and 'url=' in href:
-                match = re.search(r'[?&](?:q|url)=([^&]+)', href)
-                if match:
-                    element['href'] = match.group(1)
-
-            # Remove tracking parameters
-            if '?' in href:
-                base_url = href.split('?')[0]
-                params = href.split('?')[1].split('&')
-                # Keep only non-tracking parameters (simplified approach)
-                clean_params = [p for p in params if
-                                not any(t in p.lower() for t in ['utm_', 'ref=', 'track', 'click'])]
-                if clean_params:
-                    element['href'] = base_url + '?' + '&'.join(clean_params)
-                else:
-                    element['href'] = base_url
+            element['href'] = normalize_url(element['href'])
+
+    if guard.expired():
+        return soup.prettify()
 
     # Find and preserve search result containers
-    # Common selectors for major search engines
-    selectors = [
-        'div.g', 'div.rc', 'li.b_algo', 'div.result', 'div.algo',  # Standard results
-        'div.related-question', 'div.knowledge-panel',  # Knowledge panels
-        'div.bkWMgd', 'div.ULSxyf', 'div#search',  # Google containers
-        'ol#b_results', 'div#results', 'div#web'  # Bing/Yahoo/DDG containers
-    ]
+    # (selectors of the page's search engine, or of all engines if unknown)
+    selectors = container_selectors(engine)
 
     # Try to identify and preserve the main content area
     main_content = None
@@ -115,11 +183,8 @@ def clean_serp_html(html_content):
             noise_section.decompose()
 
     # Final cleanup - remove empty elements
-    for element in soup.find_all():
-        if not element.get_text(strip=True) and not element.find_all(['img', 'input']) and element.name not in ['br',
-                                                                                                                'hr']:
-            if not (element.name == 'a' and element.has_attr('href')):  # Keep links with hrefs
-                element.decompose()
+    if not guard.expired():
+        remove_empty_elements(soup)
 
     # Generate clean HTML
     clean_html = soup.prettify()
@@ -1,42 +1,92 @@
 import json
 import re
+import time
 from datetime import datetime
 from bs4 import BeautifulSoup
 from typing import Dict, List, Any, Optional
-from urllib.parse import urlparse, parse_qs
 
-def extract_serp(html_content: str) -> Dict[str, Any]:
+from modules.engines import DEFAULT_ENGINE, detect_engine, normalize_engine
+from modules.limits import PageGuard, ParseLimits
+from modules.metrics import record_page
+from modules.text import intern_text, node_text, text_with_highlights
+from modules.urls import google_url, is_google_redirect, resolve_redirect, url_domain
+
+def extract_serp(html_content: str,
+                 limits: Optional[ParseLimits] = None,
+                 stats: Optional[Dict[str, Any]] = None,
+                 engine: Optional[str] = None) -> Dict[str, Any]:
     """
     Extract structured data from a Search Engine Result Page HTML
     
+    Pages breaking one of the limits are cut short: whatever was extracted so
+    far is returned with search_metadata.status set to "partial" and the
+    reasons listed in search_metadata.errors.
+    
+    Only the extractors registered for the page's search engine in
+    ENGINE_EXTRACTORS run; the engine is detected unless given.
+    
+    Per-page stats (bytes in, timings, results per section, limit hits) are recorded in
+    modules.metrics. If a stats dictionary is passed, they are written into it
+    instead and recording is left to the caller (e.g. across processes).
+    
     Args:
         html_content: HTML content of the SERP page
+        limits: Resource limits for the page (defaults to DEFAULT_LIMITS)
+        stats: Dictionary to fill with per-page stats instead of recording them
+        engine: Search engine of the page ("google", "bing", "yahoo", "duckduckgo")
         
     Returns:
         Dictionary containing structured SERP data
+    
+    Raises:
+        ValueError: If engine is not a supported search engine
     """
+    record = stats is None
+    if record:
+        stats = {}
+    stats["bytes_in"] = len(html_content.encode('utf-8'))
+    engine = normalize_engine(engine) or detect_engine(html_content) or DEFAULT_ENGINE
+    stats["engine"] = engine
+
+    started = time.perf_counter()
+    guard = PageGuard(limits)
+    html_content = guard.prescan(html_content)
+    stats["prescan_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
     soup = BeautifulSoup(html_content, 'html.parser')
-
-    main_search_results = soup.select_one('#rso')
-    footer = soup.select_one('#botstuff')
-    
-    serp_data = {
-        "search_metadata": extract_metadata(soup),
-        "organic_results": extract_organic_results(main_search_results),
-        "related_searches": extract_related_searches(soup),
-        "related_questions": extract_related_questions(soup),
-        "knowledge_graph": extract_knowledge_graph(soup),
-        #"answer_box": extract_answer_box(soup),
-        #"ads": extract_ads(soup),
-        #"local_results": extract_local_results(soup),
-        "top_stories": extract_top_stories(soup),
-        "images": extract_images(soup),
-        "videos": extract_videos(soup),
-        #"pagination": extract_pagination(soup),
+    stats["parse_seconds"] = time.perf_counter() - started
+
+    serp_data = {}
+    extract_seconds = stats["extract_seconds"] = {}
+    for key, extractor, scope in ENGINE_EXTRACTORS[engine]:
+        if key != "search_metadata" and guard.expired():
+            break
+        started = time.perf_counter()
+        element = soup.select_one(scope) if scope else soup
+        if element is not None:
+            serp_data[key] = extractor(element)
+            extract_seconds[key] = time.perf_counter() - started
+    
+    stats["results"] = {
+        key: len(value) if isinstance(value, list) else int(bool(value))
+        for key, value in serp_data.items()
+        if key != "search_metadata"
     }
     
     # Remove None or empty values
     serp_data = {k: v for k, v in serp_data.items() if v}
+    serp_data["search_metadata"]["engine"] = engine
+
+    if guard.errors:
+        serp_data["search_metadata"]["status"] = "partial"
+        serp_data["search_metadata"]["errors"] = guard.errors
+    stats["limit_hits"] = dict(guard.hits)
+    stats["status"] = serp_data["search_metadata"]["status"]
+    stats["title"] = serp_data["search_metadata"]["title"]
+
+    if record:
+        record_page(stats)
     
     return serp_data
 
@@ -47,8 +97,10 @@ def extract_metadata(soup: BeautifulSoup) -> Dict[str, Any]:
     """Extract search metadata including query and engine info"""
     metadata = {
         "status": "success",
-        "engine": "google",  # Default to Google, adjust as needed
-        "title": soup.title.string if soup.title else None,
+        "engine": "google",  # Replaced by extract_serp with the detected engine
+        # Plain str: a NavigableString would keep the whole tree alive. Not
+        # interned, titles are unique per query
+        "title": str(soup.title.string) if soup.title and soup.title.string is not None else None,
         "parsed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),  # Can be filled with current timestamp
     }
     
@@ -60,25 +112,34 @@ def extract_organic_results(soup: BeautifulSoup) -> List[Dict[str, Any]]:
     organic_results = []
     results = soup.select('div.vt6azd.Ww4FFb')
     position = 0
-    print(f"found {len(results)} results")
 
     for result in (results):
+        source = result.select_one('span.VuuXrf, span.pKWwCd, div.GkAmnd, div.ZaCDgb')
+        #link = result.select_one('a.rTyHce, a.cz3goc, a.jgWGIe, a.OcpZAb, a.zReHs')
+        link = result.select_one('a')
+        title = result.select_one('h3, div.F0FGWb, div.ynAwRc, div.MBeuO, div.v7jaNc')
+
+        source_text = node_text(source) if source else ""
+        title_text = node_text(title) if title else ""
+        link_href = link['href'] if link and link.has_attr('href') else ""
+
+        # Skip incomplete blocks before extracting anything else
+        if not (source_text and title_text and link_href):
+            continue
+
         snippet_tag = result.select_one('div.VwiC3b, div.tZESfb')
-        snippet = snippet_tag.get_text(strip=True) if snippet_tag else ""
-        highlighted_words = [em.get_text(strip=True) for em in snippet_tag.select('em')] if snippet_tag else []
+        snippet, highlighted_words = text_with_highlights(snippet_tag) if snippet_tag else ("", [])
 
         date_tag = snippet_tag.select_one('.YrbPuc span') if snippet_tag else None
-        date = date_tag.get_text(strip=True) if date_tag else None
+        date = intern_text(node_text(date_tag)) if date_tag else None
 
-        source = result.select_one('span.VuuXrf, span.pKWwCd, div.GkAmnd, div.ZaCDgb')
-        #link = result.select_one('a.rTyHce, a.cz3goc, a.jgWGIe, a.OcpZAb, a.zReHs')
-        link = result.select_one('a')
         displayed_link = result.select_one('cite.qLRx3b.tjvcx, span.nC62wb.VndCse.z8gr9e')
-        title = result.select_one('h3, div.F0FGWb, div.ynAwRc, div.MBeuO, div.v7jaNc')
+        # The breadcrumb differs per URL, so unlike source and date it is not interned
+        displayed_link_text = node_text(displayed_link) if displayed_link else ""
 
         sitelinks_inline = [
             {
-                "title": tag.get_text(strip=True),
+                "title": node_text(tag),
                 "link": tag['href']
             }
             for tag in result.select('a.dM1Yyd') if tag.has_attr('href')
@@ -91,44 +152,39 @@ def extract_organic_results(soup: BeautifulSoup) -> List[Dict[str, Any]]:
             snippet_inner = item.select_one('div.zz3gNc')
             if a_tag and a_tag.has_attr('href'):
                 sitelinks_expanded.append({
-                    "title": a_tag.get_text(strip=True),
+                    "title": node_text(a_tag),
                     "link": a_tag['href'],
-                    "snippet": snippet_inner.get_text(strip=True) if snippet_inner else ""
+                    "snippet": node_text(snippet_inner) if snippet_inner else ""
                 })
 
         # Expanded sitelinks (mobile style) 
         for a_tag in result.select('a.ynAwRc'):
             if a_tag.has_attr('href'):
                 sitelinks_expanded.append({
-                    "title": a_tag.get_text(strip=True),
+                    "title": node_text(a_tag),
                     "link": a_tag['href'],
                     #"snippet": None
                 })
 
-        source_text = source.get_text(strip=True) if source else ""
-        title_text = title.get_text(strip=True) if title else ""
-        link_href = link['href'] if link and link.has_attr('href') else ""
-        displayed_link_text = displayed_link.get_text(strip=True) if displayed_link else ""
-
-        if source_text and title_text and link_href:
-            position += 1
-            organic_results.append({
-                "position": position,
-                "source": source_text,
-                "title": title_text,
-                "date": date,
-                "link": link_href,
-                "displayed_link": displayed_link_text,
-                "redirect_link": (
-                    "https://www.google.com" + link['ping']
-                    if link and link.has_attr('ping')
-                    else ""
-                ),
-                "snippet": snippet,
-                "snippet_highlighted_words": highlighted_words,
-                "sitelinks_inline": sitelinks_inline,
-                "sitelinks_expanded": sitelinks_expanded
-            })
+        position += 1
+        organic_results.append({
+            "position": position,
+            "source": intern_text(source_text),
+            "title": title_text,
+            "date": date,
+            "link": link_href,
+            "domain": url_domain(link_href),
+            "displayed_link": displayed_link_text,
+            "redirect_link": (
+                google_url(link['ping'])
+                if link.has_attr('ping')
+                else ""
+            ),
+            "snippet": snippet,
+            "snippet_highlighted_words": highlighted_words,
+            "sitelinks_inline": sitelinks_inline,
+            "sitelinks_expanded": sitelinks_expanded
+        })
 
     return organic_results
 
@@ -183,7 +239,7 @@ def extract_related_questions(soup: BeautifulSoup) -> List[str]:
     for block in paa_blocks:
         span = block.find('span')
         if span:
-            related_questions.append(span.get_text(strip=True))
+            related_questions.append(node_text(span))
    
     return related_questions
 
@@ -259,13 +315,10 @@ def extract_answer_box(soup: BeautifulSoup) -> Dict[str, Any]:
     link = snippet_element.select_one('a')
     if link and link.has_attr('href'):
         href = link['href']
-        if href.startswith('/url?'):
-            parsed_url = urlparse(href)
-            query_params = parse_qs(parsed_url.query)
-            if 'q' in query_params:
-                answer_box["link"] = query_params['q'][0]
-        else:
-            answer_box["link"] = href
+        target = resolve_redirect(href)
+        # Skip redirect links without a target
+        if target != href or not is_google_redirect(href):
+            answer_box["link"] = target
     
     return answer_box
 
@@ -414,13 +467,10 @@ def extract_top_stories(soup: BeautifulSoup) -> List[Dict[str, Any]]:
         link = element.select_one('a')
         if link and link.has_attr('href'):
             href = link['href']
-            if href.startswith('/url?'):
-                parsed_url = urlparse(href)
-                query_params = parse_qs(parsed_url.query)
-                if 'q' in query_params:
-                    story["link"] = query_params['q'][0]
-            else:
-                story["link"] = href
+            target = resolve_redirect(href)
+            # Skip redirect links without a target
+            if target != href or not is_google_redirect(href):
+                story["link"] = target
         
         # Extract thumbnail
         thumbnail = element.select_one('img')
@@ -527,6 +577,74 @@ def extract_pagination(soup: BeautifulSoup) -> Dict[str, Any]:
     
     return pagination
 
+def _extract_simple_results(soup: BeautifulSoup, result_selector: str, title_selector: str,
+                            snippet_selector: str, displayed_link_selector: str) -> List[Dict[str, Any]]:
+    """Extract organic results of engines with a flat title/link/snippet layout"""
+    organic_results = []
+    for result in soup.select(result_selector):
+        title = result.select_one(title_selector)
+        link = title if title and title.name == 'a' else (title.select_one('a') if title else None)
+        if not title or not link or not link.has_attr('href'):
+            continue
+        snippet = result.select_one(snippet_selector)
+        displayed_link = result.select_one(displayed_link_selector)
+        organic_results.append({
+            "position": len(organic_results) + 1,
+            "title": title.get_text(strip=True),
+            "link": link['href'],
+            "domain": url_domain(link['href']),
+            "displayed_link": displayed_link.get_text(strip=True) if displayed_link else "",
+            "snippet": snippet.get_text(strip=True) if snippet else "",
+        })
+    return organic_results
+
+
+def extract_bing_organic_results(soup: BeautifulSoup) -> List[Dict[str, Any]]:
+    """Extract Bing organic results"""
+    return _extract_simple_results(soup, 'li.b_algo', 'h2', 'div.b_caption p, p.b_lineclamp2', 'cite')
+
+
+def extract_yahoo_organic_results(soup: BeautifulSoup) -> List[Dict[str, Any]]:
+    """Extract Yahoo organic results"""
+    return _extract_simple_results(soup, 'div.algo', 'h3', 'div.compText', 'div.compTitle span')
+
+
+def extract_duckduckgo_organic_results(soup: BeautifulSoup) -> List[Dict[str, Any]]:
+    """Extract DuckDuckGo (HTML version) organic results"""
+    return _extract_simple_results(soup, 'div.result', 'a.result__a', '.result__snippet', '.result__url')
+
+
+# Extractors per search engine: (output key, extractor, scope selector or
+# None for the whole page). Pages only pay for their own engine's selectors.
+ENGINE_EXTRACTORS = {
+    "google": [
+        ("search_metadata", extract_metadata, None),
+        ("organic_results", extract_organic_results, '#rso'),
+        ("related_searches", extract_related_searches, None),
+        ("related_questions", extract_related_questions, None),
+        ("knowledge_graph", extract_knowledge_graph, None),
+        #("answer_box", extract_answer_box, None),
+        #("ads", extract_ads, None),
+        #("local_results", extract_local_results, None),
+        ("top_stories", extract_top_stories, None),
+        ("images", extract_images, None),
+        ("videos", extract_videos, None),
+        #("pagination", extract_pagination, None),
+    ],
+    "bing": [
+        ("search_metadata", extract_metadata, None),
+        ("organic_results", extract_bing_organic_results, '#b_results'),
+    ],
+    "yahoo": [
+        ("search_metadata", extract_metadata, None),
+        ("organic_results", extract_yahoo_organic_results, '#web'),
+    ],
+    "duckduckgo": [
+        ("search_metadata", extract_metadata, None),
+        ("organic_results", extract_duckduckgo_organic_results, '#links'),
+    ],
+}
+
 # Example usage
 def parse_serp_from_file(html_file_path):
     """Parse SERP from an HTML file and return structured JSON"""
@@ -0,0 +1,257 @@
+import argparse
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from modules.urls import url_domain
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    page_key TEXT NOT NULL UNIQUE,
+    engine TEXT,
+    title TEXT,
+    status TEXT,
+    parsed_at TEXT,
+    kg_title TEXT,
+    kg_type TEXT,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_kg_type ON pages (kg_type);
+
+CREATE TABLE IF NOT EXISTS sections (
+    page_id INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    results INTEGER NOT NULL,
+    PRIMARY KEY (section, page_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS organic (
+    page_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    domain TEXT,
+    link TEXT,
+    PRIMARY KEY (page_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS organic_domain ON organic (domain, position);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_text USING fts5 (title, related_questions);
+"""
+
+
+def _domain_key(domain: str) -> Optional[str]:
+    """Normalize a domain filter the way organic domains are stored (url_domain)"""
+    return url_domain(domain if "://" in domain else "http://" + domain.strip())
+
+
+def _match_terms(text: str) -> str:
+    """Quote every whitespace-separated term, so punctuation is matched, not parsed"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+class SerpIndex:
+    """
+    sqlite index of extracted SERPs answering filtered lookups
+
+    Query/title, organic domains and positions, section presence, knowledge
+    graph type and related questions are indexed in their own tables (text
+    through FTS5), so lookups never deserialize the stored documents.
+
+    Args:
+        path: Path of the sqlite database (created if missing)
+    """
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.connection.commit()
+        self.connection.close()
+
+    def _remove(self, page_id: int) -> None:
+        for table in ("sections", "organic"):
+            self.connection.execute(f"DELETE FROM {table} WHERE page_id = ?", (page_id,))
+        self.connection.execute("DELETE FROM pages_text WHERE rowid = ?", (page_id,))
+        self.connection.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+
+    def add(self, page_key: str, serp_data: Dict[str, Any]) -> None:
+        """
+        Index an extracted SERP (replacing any page with the same key)
+
+        Args:
+            page_key: Identifier of the page (e.g. its file name)
+            serp_data: SERP data as returned by extract_serp
+        """
+        connection = self.connection
+        row = connection.execute("SELECT id FROM pages WHERE page_key = ?", (page_key,)).fetchone()
+        if row:
+            self._remove(row[0])
+
+        metadata = serp_data.get("search_metadata", {})
+        knowledge_graph = serp_data.get("knowledge_graph") or {}
+        cursor = connection.execute(
+            "INSERT INTO pages (page_key, engine, title, status, parsed_at, kg_title, kg_type, document) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                page_key,
+                metadata.get("engine"),
+                metadata.get("title"),
+                metadata.get("status"),
+                metadata.get("parsed_at"),
+                knowledge_graph.get("title"),
+                knowledge_graph.get("type"),
+                json.dumps(serp_data, ensure_ascii=False),
+            ),
+        )
+        page_id = cursor.lastrowid
+
+        connection.executemany(
+            "INSERT INTO sections (page_id, section, results) VALUES (?, ?, ?)",
+            [
+                (page_id, section, len(value) if isinstance(value, list) else 1)
+                for section, value in serp_data.items()
+                if section != "search_metadata" and value
+            ],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO organic (page_id, position, domain, link) VALUES (?, ?, ?, ?)",
+            [
+                (page_id, result["position"], result.get("domain") or url_domain(result["link"]), result["link"])
+                for result in serp_data.get("organic_results", ())
+            ],
+        )
+        connection.execute(
+            "INSERT INTO pages_text (rowid, title, related_questions) VALUES (?, ?, ?)",
+            (page_id, metadata.get("title") or "", "\n".join(serp_data.get("related_questions", ()))),
+        )
+
+    def add_many(self, pages: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Index (page_key, serp_data) pairs in one transaction; return the count"""
+        count = 0
+        with self.connection:
+            for page_key, serp_data in pages:
+                self.add(page_key, serp_data)
+                count += 1
+        return count
+
+    def add_jsonl(self, path: str) -> int:
+        """
+        Index a JSONL file of {"file": ..., "serp": ...} lines (sharded runner output)
+
+        Records of files that failed extraction ({"file": ..., "error": ...})
+        are skipped.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.add_many((record["file"], record["serp"]) for record in map(json.loads, f) if "serp" in record)
+
+    def query(self,
+              domain: Optional[str] = None,
+              max_position: Optional[int] = None,
+              section: Optional[str] = None,
+              kg_type: Optional[str] = None,
+              text: Optional[str] = None,
+              engine: Optional[str] = None,
+              limit: Optional[int] = None,
+              raw_text: bool = False) -> List[str]:
+        """
+        Return the keys of pages matching all given filters
+
+        Args:
+            domain: Organic results include this domain (e.g. "python.org";
+                normalized like stored domains, so "www.python.org" works too)
+            max_position: ... at or above this position (requires domain)
+            section: The page has a non-empty section (e.g. "knowledge_graph")
+            kg_type: The knowledge graph has this type
+            text: Terms that must all appear in the title/query or related
+                questions (matched as plain words, punctuation is ignored)
+            engine: The page comes from this search engine
+            limit: Maximum number of keys to return
+            raw_text: Pass text to FTS5 MATCH as is (FTS5 query syntax)
+
+        Returns:
+            Matching page keys, in indexing order
+        """
+        conditions, parameters = [], []
+        if domain is not None:
+            condition = "p.id IN (SELECT page_id FROM organic WHERE domain = ?"
+            parameters.append(_domain_key(domain))
+            if max_position is not None:
+                condition += " AND position <= ?"
+                parameters.append(max_position)
+            conditions.append(condition + ")")
+        elif max_position is not None:
+            raise ValueError("max_position requires domain")
+        if section is not None:
+            conditions.append("p.id IN (SELECT page_id FROM sections WHERE section = ?)")
+            parameters.append(section)
+        if kg_type is not None:
+            conditions.append("p.kg_type = ?")
+            parameters.append(kg_type)
+        if text is not None:
+            match = text if raw_text else _match_terms(text)
+            if match:
+                conditions.append("p.id IN (SELECT rowid FROM pages_text WHERE pages_text MATCH ?)")
+                parameters.append(match)
+            else:
+                conditions.append("0")
+        if engine is not None:
+            conditions.append("p.engine = ?")
+            parameters.append(engine)
+
+        sql = "SELECT p.page_key FROM pages p"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY p.id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return [row[0] for row in self.connection.execute(sql, parameters)]
+
+    def get(self, page_key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored SERP data of a page"""
+        row = self.connection.execute("SELECT document FROM pages WHERE page_key = ?", (page_key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def domain_positions(self, domain: str) -> List[Tuple[str, int]]:
+        """Return (page_key, position) for every organic result of a domain"""
+        return self.connection.execute(
+            "SELECT p.page_key, o.position FROM organic o JOIN pages p ON p.id = o.page_id "
+            "WHERE o.domain = ? ORDER BY p.id, o.position",
+            (_domain_key(domain),),
+        ).fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index and query extracted SERPs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="index JSONL outputs of the sharded runner")
+    build_parser.add_argument("index")
+    build_parser.add_argument("jsonl", nargs="+")
+
+    query_parser = subparsers.add_parser("query", help="list pages matching filters")
+    query_parser.add_argument("index")
+    query_parser.add_argument("--domain")
+    query_parser.add_argument("--max-position", type=int)
+    query_parser.add_argument("--section")
+    query_parser.add_argument("--kg-type")
+    query_parser.add_argument("--text", help="words to look for in titles and related questions")
+    query_parser.add_argument("--raw-text", action="store_true", help="treat --text as an FTS5 query")
+    query_parser.add_argument("--engine")
+    query_parser.add_argument("--limit", type=int)
+
+    args = parser.parse_args()
+    with SerpIndex(args.index) as index:
+        if args.command == "build":
+            print(f"Indexed {sum(index.add_jsonl(path) for path in args.jsonl)} pages")
+        else:
+            for page_key in index.query(args.domain, args.max_position, args.section,
+                                        args.kg_type, args.text, args.engine, args.limit, args.raw_text):
+                print(page_key)
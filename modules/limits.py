@@ -0,0 +1,197 @@
+import time
+from collections import Counter
+from dataclasses import dataclass
+from html import escape
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+
+# Check the clock only every so many tags while scanning
+_DEADLINE_CHECK_INTERVAL = 1000
+
+
+@dataclass(frozen=True)
+class ParseLimits:
+    """
+    Resource limits applied to a single page
+
+    A limit set to None is disabled.
+
+    Attributes:
+        max_seconds: Wall time budget for processing the page
+        max_depth: Maximum element nesting depth
+        max_nodes: Maximum number of elements
+        max_attr_length: Attribute values longer than this are truncated
+    """
+    max_seconds: Optional[float] = 30.0
+    max_depth: Optional[int] = 512
+    max_nodes: Optional[int] = 100_000
+    max_attr_length: Optional[int] = 100_000
+
+
+DEFAULT_LIMITS = ParseLimits()
+NO_LIMITS = ParseLimits(max_seconds=None, max_depth=None, max_nodes=None, max_attr_length=None)
+
+
+class LimitExceeded(Exception):
+    """Raised while scanning a page that breaks one of its limits"""
+
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit
+
+
+class _LimitScanner(HTMLParser):
+    """Tokenize HTML without building a tree, checking limits on every tag"""
+
+    def __init__(self, guard: "PageGuard"):
+        super().__init__(convert_charrefs=False)
+        self.guard = guard
+        self.limits = guard.limits
+        self.depth = 0
+        self.nodes = 0
+        self.long_attributes = 0
+        # (line, column, raw text, rebuilt text) of start tags to rewrite
+        self.truncated_tags: List[Tuple[int, int, str, str]] = []
+
+    def handle_starttag(self, tag, attrs):
+        limits = self.limits
+        self.nodes += 1
+        if tag not in VOID_ELEMENTS:
+            self.depth += 1
+
+        if limits.max_nodes is not None and self.nodes > limits.max_nodes:
+            raise LimitExceeded("max_nodes", f"page has more than {limits.max_nodes} elements")
+        if limits.max_depth is not None and self.depth > limits.max_depth:
+            raise LimitExceeded("max_depth", f"page nests elements deeper than {limits.max_depth}")
+        if limits.max_attr_length is not None:
+            long_attributes = sum(1 for _, value in attrs if value and len(value) > limits.max_attr_length)
+            if long_attributes:
+                self.long_attributes += long_attributes
+                raw = self.get_starttag_text()
+                self.truncated_tags.append((*self.getpos(), raw, _rebuild_starttag(tag, attrs, raw, limits)))
+        if self.nodes % _DEADLINE_CHECK_INTERVAL == 0 and self.guard.time_left() == 0:
+            raise LimitExceeded("max_seconds", f"page took longer than {limits.max_seconds}s")
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_ELEMENTS and self.depth > 0:
+            self.depth -= 1
+
+
+def _rebuild_starttag(tag: str, attrs, raw: str, limits: ParseLimits) -> str:
+    """Serialize a start tag with attribute values cut to max_attr_length"""
+    parts = [tag]
+    for name, value in attrs:
+        if value is None:
+            parts.append(name)
+        else:
+            parts.append(f'{name}="{escape(value[:limits.max_attr_length])}"')
+    return "<" + " ".join(parts) + ("/>" if raw.endswith("/>") else ">")
+
+
+def _offset(html_content: str, line: int, column: int) -> int:
+    """Convert a 1-based line and 0-based column into a string offset"""
+    offset = 0
+    for _ in range(line - 1):
+        offset = html_content.index('\n', offset) + 1
+    return offset + column
+
+
+def _truncate_attributes(html_content: str, tags: List[Tuple[int, int, str, str]]) -> str:
+    """Replace the start tags reported by the scanner with their rebuilt text"""
+    pieces = []
+    offset = line_offset = 0
+    line = 1
+    for tag_line, column, raw, rebuilt in tags:
+        for _ in range(tag_line - line):
+            line_offset = html_content.index('\n', line_offset) + 1
+        line = tag_line
+        start = line_offset + column
+        if start >= len(html_content):
+            break
+        pieces.append(html_content[offset:start])
+        pieces.append(rebuilt)
+        offset = start + len(raw)
+    pieces.append(html_content[offset:])
+    return ''.join(pieces)
+
+
+class PageGuard:
+    """
+    Track the limits of a single page through the processing pipeline
+
+    Every limit hit is recorded in `errors` and counted in `hits`, so the
+    pipeline can return a partial result together with the reason it stopped
+    and report the hits with the page's stats.
+    """
+
+    def __init__(self, limits: Optional[ParseLimits] = None):
+        self.limits = limits or DEFAULT_LIMITS
+        self.started = time.monotonic()
+        self.deadline = (
+            self.started + self.limits.max_seconds
+            if self.limits.max_seconds is not None
+            else None
+        )
+        self.errors: List[str] = []
+        self.hits: Counter = Counter()
+        self._expired = False
+
+    def hit(self, limit: str, message: str) -> None:
+        """Record that a limit was hit"""
+        self.hits[limit] += 1
+        self.errors.append(message)
+
+    def time_left(self) -> Optional[float]:
+        """Seconds left before the deadline (None when there is no deadline)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        """Return True once the wall time budget is spent (recorded only once)"""
+        if self._expired:
+            return True
+        if self.time_left() == 0:
+            self._expired = True
+            self.hit("max_seconds", f"page took longer than {self.limits.max_seconds}s")
+        return self._expired
+
+    def prescan(self, html_content: str) -> str:
+        """
+        Check the raw HTML against the limits before building a tree
+
+        Pages with too many or too deeply nested elements are cut off at the
+        offending tag, and oversized attribute values are truncated, so the
+        parser only ever sees a bounded document.
+
+        Args:
+            html_content: Raw HTML content of the page
+
+        Returns:
+            The HTML content that is safe to parse
+        """
+        limits = self.limits
+        if limits.max_depth is None and limits.max_nodes is None and limits.max_attr_length is None:
+            return html_content
+
+        scanner = _LimitScanner(self)
+        try:
+            scanner.feed(html_content)
+            scanner.close()
+        except LimitExceeded as e:
+            if e.limit == "max_seconds":
+                self._expired = True
+            self.hit(e.limit, str(e))
+            html_content = html_content[:_offset(html_content, *scanner.getpos())]
+
+        if scanner.truncated_tags:
+            self.hit("max_attr_length",
+                     f"truncated {scanner.long_attributes} attribute values longer than {limits.max_attr_length}")
+            html_content = _truncate_attributes(html_content, scanner.truncated_tags)
+
+        return html_content
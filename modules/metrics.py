@@ -0,0 +1,241 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RESULT_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    """Render a sorted label tuple in Prometheus text format"""
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Counter:
+    """Monotonically increasing value, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(labels)} {value}" for labels, value in items]
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets, optionally split by labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # Per-bucket counts followed by the total count and sum
+            counts = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(counts)) for labels, counts in self._values.items()]
+        lines = []
+        for labels, counts in items:
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', str(bound)),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {counts[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {counts[-2]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._caches: Dict[str, Callable] = {}
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, buckets))
+
+    def register_cache(self, name: str, cached_function: Callable) -> None:
+        """Expose hits and misses of a functools.lru_cache wrapped function"""
+        self._caches[name] = cached_function
+
+    def _cache_samples(self) -> List[str]:
+        if not self._caches:
+            return []
+        lines = [
+            "# HELP serp_cache_hits_total Cache hits per cache",
+            "# TYPE serp_cache_hits_total counter",
+        ]
+        infos = {name: function.cache_info() for name, function in self._caches.items()}
+        lines += [f'serp_cache_hits_total{{cache="{name}"}} {info.hits}' for name, info in infos.items()]
+        lines += [
+            "# HELP serp_cache_misses_total Cache misses per cache",
+            "# TYPE serp_cache_misses_total counter",
+        ]
+        lines += [f'serp_cache_misses_total{{cache="{name}"}} {info.misses}' for name, info in infos.items()]
+        lines += [
+            "# HELP serp_cache_hit_ratio Share of cache lookups that were hits",
+            "# TYPE serp_cache_hit_ratio gauge",
+        ]
+        for name, info in infos.items():
+            lookups = info.hits + info.misses
+            lines.append(f'serp_cache_hit_ratio{{cache="{name}"}} {info.hits / lookups if lookups else 0.0}')
+        return lines
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        lines.extend(self._cache_samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+pages_processed = REGISTRY.counter("serp_pages_total", "Pages processed by status")
+bytes_in = REGISTRY.counter("serp_bytes_in_total", "Bytes of HTML received")
+zero_result_pages = REGISTRY.counter("serp_zero_result_pages_total",
+                                     "Pages without organic results (likely selector breakage)")
+prescan_seconds = REGISTRY.histogram("serp_prescan_seconds", "Time spent checking parse limits before parsing")
+parse_seconds = REGISTRY.histogram("serp_parse_seconds", "Time spent building the HTML tree")
+clean_seconds = REGISTRY.histogram("serp_clean_seconds", "Time spent in clean_serp_html")
+extract_seconds = REGISTRY.histogram("serp_extract_seconds", "Time spent per extraction section")
+section_results = REGISTRY.histogram("serp_section_results", "Results extracted per section",
+                                     RESULT_COUNT_BUCKETS)
+limit_hits = REGISTRY.counter("serp_limit_hits_total", "Parse limit hits, by limit")
+
+
+_stats_log = None
+_stats_log_lock = threading.Lock()
+
+
+def set_stats_log(path: Optional[str]) -> None:
+    """
+    Append per-page stats as JSON lines to path (None stops logging)
+
+    Args:
+        path: Path of the JSONL file to append to
+    """
+    global _stats_log
+    with _stats_log_lock:
+        if _stats_log is not None:
+            _stats_log.close()
+        _stats_log = open(path, 'a', encoding='utf-8') if path else None
+
+
+def record_limit_hits(hits: Mapping[str, int]) -> None:
+    """Count the parse limit hits of one page (see PageGuard.hits)"""
+    for limit, count in hits.items():
+        limit_hits.inc(count, limit=limit)
+
+
+def record_page(stats: Dict[str, Any]) -> None:
+    """
+    Record the stats of one extracted page in the metrics and stats log
+
+    Args:
+        stats: Per-page stats as filled in by extract_serp (or a status "error"
+            entry for a page that could not be extracted)
+    """
+    status = stats.get("status", "success")
+    pages_processed.inc(status=status)
+    bytes_in.inc(stats.get("bytes_in", 0))
+    record_limit_hits(stats.get("limit_hits", {}))
+    if "prescan_seconds" in stats:
+        prescan_seconds.observe(stats["prescan_seconds"])
+    if "parse_seconds" in stats:
+        parse_seconds.observe(stats["parse_seconds"])
+    for section, seconds in stats.get("extract_seconds", {}).items():
+        extract_seconds.observe(seconds, section=section)
+    for section, count in stats.get("results", {}).items():
+        section_results.observe(count, section=section)
+    # Failed pages say nothing about the selectors
+    if status != "error" and not stats.get("results", {}).get("organic_results"):
+        zero_result_pages.inc()
+
+    if _stats_log is not None:
+        line = json.dumps(stats, ensure_ascii=False)
+        with _stats_log_lock:
+            if _stats_log is not None:
+                _stats_log.write(line + "\n")
+                _stats_log.flush()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int = 9100, host: str = '0.0.0.0', registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serve the registry on http://host:port/metrics from a background thread
+
+    Metrics are kept per process, so serve them from the process that runs
+    the extraction (or that collects stats from worker processes).
+
+    Args:
+        port: Port to listen on
+        host: Interface to bind to
+        registry: Registry to expose
+
+    Returns:
+        The running server (call shutdown() to stop it)
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,292 @@
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from modules.engines import DEFAULT_ENGINE, detect_engine
+from modules.html_cleaner import clean_serp_html
+from modules.html_to_json import ENGINE_EXTRACTORS, extract_serp
+from modules.limits import NO_LIMITS
+from modules.text import clear_text_cache
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "serps")
+PAGES_DIR = "pages"
+GOLDEN_DIR = "golden"
+BASELINE_FILE = "baseline.json"
+
+# Fields that legitimately change between runs
+VOLATILE_METADATA = ("parsed_at",)
+
+# Every timing sample repeats its stage until it ran at least this long, so
+# stages taking microseconds per call are timed well above the clock's noise
+MIN_SAMPLE_SECONDS = 0.005
+
+# Fixed parse workload timed on every run; stage times are stored and
+# compared relative to it, so a baseline recorded on one machine holds on
+# another (CI runners, laptops) as long as their speeds scale alike
+_CALIBRATION_HTML = "<html><body>" + "".join(
+    f'<div class="g" id="r{i}"><a href="https://example.com/{i}"><h3>Title {i}</h3></a>'
+    f'<span class="s">Snippet <em>{i}</em> text</span></div>'
+    for i in range(300)
+) + "</body></html>"
+
+
+def _normalized(serp_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a JSON round-tripped copy without volatile fields"""
+    serp_data = json.loads(json.dumps(serp_data, ensure_ascii=False))
+    for field in VOLATILE_METADATA:
+        serp_data.get("search_metadata", {}).pop(field, None)
+    return serp_data
+
+
+def _measure(function, *args, repeat: int = 1, reset=None):
+    """
+    Return (result, fastest seconds per call, peak bytes) of calling function(*args)
+
+    Each of the repeat samples calls function until MIN_SAMPLE_SECONDS have
+    been spent in it. reset, if given, runs untimed before every call.
+    """
+    durations = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # As in timeit, so collections triggered by earlier stages do not count
+    try:
+        for _ in range(repeat):
+            calls, elapsed = 0, 0.0
+            while elapsed < MIN_SAMPLE_SECONDS:
+                if reset:
+                    reset()
+                started = time.perf_counter()
+                result = function(*args)
+                elapsed += time.perf_counter() - started
+                calls += 1
+            durations.append(elapsed / calls)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # Like timeit, keep the fastest sample: the others were slowed by other load
+    return result, min(durations), peak
+
+
+def calibration_seconds(repeat: int) -> float:
+    """Fastest time per call of the fixed calibration workload on this machine"""
+    _, seconds, _ = _measure(BeautifulSoup, _CALIBRATION_HTML, 'html.parser', repeat=max(repeat, 5))
+    return seconds
+
+
+def load_corpus(corpus_dir: str) -> Dict[str, str]:
+    """Return {page name: html} for every fixture page, sorted by name"""
+    pages_dir = os.path.join(corpus_dir, PAGES_DIR)
+    pages = {}
+    for filename in sorted(os.listdir(pages_dir)):
+        if filename.endswith(".html"):
+            with open(os.path.join(pages_dir, filename), 'r', encoding='utf-8') as f:
+                pages[os.path.splitext(filename)[0]] = f.read()
+    return pages
+
+
+def corpus_version(pages: Dict[str, str]) -> str:
+    """Fingerprint of the fixture pages; baselines only compare within a version"""
+    digest = hashlib.sha256()
+    for name, html_content in pages.items():
+        digest.update(name.encode('utf-8'))
+        digest.update(hashlib.sha256(html_content.encode('utf-8')).digest())
+    return digest.hexdigest()[:16]
+
+
+def diff_sections(actual: Dict[str, Any], golden: Dict[str, Any]) -> Dict[str, str]:
+    """Compare each section: "ok", "changed", "missing" (lost) or "added" (new)"""
+    sections = {}
+    for section in sorted(set(actual) | set(golden)):
+        if section not in actual:
+            sections[section] = "missing"
+        elif section not in golden:
+            sections[section] = "added"
+        else:
+            sections[section] = "ok" if actual[section] == golden[section] else "changed"
+    return sections
+
+
+def profile_page(html_content: str, repeat: int) -> Dict[str, Dict[str, float]]:
+    """
+    Time and measure peak memory of each pipeline stage on one page
+
+    Stages are "clean", "parse" and every extractor registered for the page's
+    engine, each run in isolation on the same parsed tree. Texts cached on
+    the tree are dropped before every extractor call, so each call pays for
+    its text extraction as it does on a freshly parsed page.
+    """
+    profile = {}
+    _, seconds, peak = _measure(clean_serp_html, html_content, NO_LIMITS, repeat=repeat)
+    profile["clean"] = {"seconds": seconds, "peak_bytes": peak}
+    soup, seconds, peak = _measure(BeautifulSoup, html_content, 'html.parser', repeat=repeat)
+    profile["parse"] = {"seconds": seconds, "peak_bytes": peak}
+
+    engine = detect_engine(html_content) or DEFAULT_ENGINE
+    for key, extractor, scope in ENGINE_EXTRACTORS[engine]:
+        element = soup.select_one(scope) if scope else soup
+        if element is None:
+            continue
+        _, seconds, peak = _measure(extractor, element, repeat=repeat,
+                                    reset=lambda: clear_text_cache(element))
+        profile[f"{engine}:{key}"] = {"seconds": seconds, "peak_bytes": peak}
+    return profile
+
+
+def _compare_golden(path: str, actual: Any, update: bool, compare) -> Any:
+    """Compare actual with the golden file at path (rewritten when update is set)"""
+    if update:
+        with open(path, 'w', encoding='utf-8') as f:
+            if isinstance(actual, str):
+                f.write(actual)
+            else:
+                json.dump(actual, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+        return compare(actual, actual)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        golden = f.read() if isinstance(actual, str) else json.load(f)
+    return compare(actual, golden)
+
+
+def run_regression(corpus_dir: str = DEFAULT_CORPUS,
+                   repeat: int = 5,
+                   time_threshold: float = 1.5,
+                   memory_threshold: float = 1.5,
+                   update_golden: bool = False,
+                   update_baseline: bool = False) -> Dict[str, Any]:
+    """
+    Run the fixture corpus through the pipeline and compare with goldens and baseline
+
+    Outputs of extract_serp are diffed per section against golden/<page>.json
+    and outputs of clean_serp_html against golden/<page>.clean.html.
+    Per-stage time (fastest of repeat samples of the time per call, each
+    sample looping the stage for at least MIN_SAMPLE_SECONDS, relative to a
+    calibration workload timed in the same run) and peak memory, summed over the corpus, are
+    compared with the stored baseline; a stage regresses when it exceeds the
+    baseline by the given factor. A missing golden file or baseline counts as
+    a regression; files are only written when asked to update them.
+
+    Args:
+        corpus_dir: Directory with pages/*.html, golden/ and baseline.json
+        repeat: Number of timing samples per stage and page
+        time_threshold: Allowed relative time factor over the baseline
+        memory_threshold: Allowed peak memory factor over the baseline
+        update_golden: Rewrite the golden outputs instead of comparing
+        update_baseline: Rewrite the performance baseline instead of comparing
+
+    Returns:
+        Machine-readable report; report["passed"] is False on any regression
+    """
+    pages = load_corpus(corpus_dir)
+    version = corpus_version(pages)
+    golden_dir = os.path.join(corpus_dir, GOLDEN_DIR)
+    if update_golden:
+        os.makedirs(golden_dir, exist_ok=True)
+
+    calibration = calibration_seconds(repeat)
+    report: Dict[str, Any] = {"corpus_version": version, "calibration_seconds": calibration,
+                              "pages": {}, "stages": {}, "regressions": []}
+    regressions = report["regressions"]
+    totals: Dict[str, Dict[str, float]] = {}
+
+    for name, html_content in pages.items():
+        actual = _normalized(extract_serp(html_content, NO_LIMITS, stats={}))
+        sections = _compare_golden(os.path.join(golden_dir, f"{name}.json"), actual, update_golden, diff_sections)
+        clean_html = _compare_golden(os.path.join(golden_dir, f"{name}.clean.html"),
+                                     clean_serp_html(html_content, NO_LIMITS), update_golden,
+                                     lambda actual, golden: "ok" if actual == golden else "changed")
+        report["pages"][name] = {"sections": sections, "clean_html": clean_html}
+
+        if sections is None:
+            regressions.append({"type": "output", "page": name, "outcome": "no golden"})
+        else:
+            for section, outcome in sections.items():
+                if outcome != "ok":
+                    regressions.append({"type": "output", "page": name, "section": section, "outcome": outcome})
+        if clean_html != "ok":
+            regressions.append({"type": "clean_html", "page": name, "outcome": clean_html or "no golden"})
+
+        for stage, measures in profile_page(html_content, repeat).items():
+            total = totals.setdefault(stage, {"seconds": 0.0, "peak_bytes": 0})
+            total["seconds"] += measures["seconds"]
+            total["peak_bytes"] = max(total["peak_bytes"], measures["peak_bytes"])
+    for total in totals.values():
+        total["relative_seconds"] = total["seconds"] / calibration
+
+    baseline_path = os.path.join(corpus_dir, BASELINE_FILE)
+    baseline: Optional[Dict[str, Any]] = None
+    if update_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump({"corpus_version": version, "python": platform.python_version(), "stages": totals}, f, indent=2)
+            f.write("\n")
+    elif not os.path.exists(baseline_path):
+        regressions.append({"type": "baseline", "outcome": "no baseline; performance not compared"})
+    else:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("corpus_version") != version:
+            regressions.append({"type": "baseline",
+                                "outcome": "baseline recorded for another corpus version; performance not compared"})
+            baseline = None
+
+    for stage, total in totals.items():
+        entry: Dict[str, Any] = dict(total)
+        reference = baseline["stages"].get(stage) if baseline else None
+        if reference:
+            entry["baseline_relative_seconds"] = reference["relative_seconds"]
+            entry["baseline_peak_bytes"] = reference["peak_bytes"]
+            if total["relative_seconds"] > reference["relative_seconds"] * time_threshold:
+                regressions.append({"type": "time", "stage": stage, "relative_seconds": total["relative_seconds"],
+                                    "baseline": reference["relative_seconds"]})
+            if reference["peak_bytes"] and total["peak_bytes"] > reference["peak_bytes"] * memory_threshold:
+                regressions.append({"type": "memory", "stage": stage,
+                                    "peak_bytes": total["peak_bytes"], "baseline": reference["peak_bytes"]})
+        elif baseline:
+            entry["baseline_note"] = "stage not in baseline"
+        report["stages"][stage] = entry
+
+    report["passed"] = not regressions
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Golden-output and performance regression gate")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="fixture corpus directory")
+    parser.add_argument("--report", help="write the JSON report to this file (default: stdout)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--time-threshold", type=float, default=1.5)
+    parser.add_argument("--memory-threshold", type=float, default=1.5)
+    parser.add_argument("--update-golden", action="store_true")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = run_regression(args.corpus, args.repeat, args.time_threshold, args.memory_threshold,
+                            args.update_golden, args.update_baseline)
+    output = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
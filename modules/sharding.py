@@ -0,0 +1,372 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.html_to_json import extract_serp
+
+QUEUE_FILE = "queue.sqlite"
+MANIFEST_FILE = "manifest.json"
+OUTPUT_DIR = "shards"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    files TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output TEXT,
+    error TEXT,
+    failed_files TEXT
+);
+CREATE TABLE IF NOT EXISTS job (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def shard_of(name: str, num_shards: int) -> int:
+    """
+    Return the shard of an input file (stable across machines and runs)
+
+    Args:
+        name: Path of the input relative to the input directory
+        num_shards: Total number of shards
+
+    Returns:
+        Shard index in range(num_shards)
+    """
+    digest = hashlib.sha1(name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % num_shards
+
+
+def _connect(job_dir: str) -> sqlite3.Connection:
+    """Open the job queue (autocommit, transactions are explicit)"""
+    connection = sqlite3.connect(os.path.join(job_dir, QUEUE_FILE), timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def plan_job(input_dir: str, job_dir: str, num_shards: int) -> int:
+    """
+    Split the HTML files of input_dir into shards and create the work queue
+
+    Planning is idempotent: if the job already exists it is left untouched.
+    The input directory is stored as an absolute path, so every node must
+    mount the inputs (like job_dir) at the same path.
+
+    Args:
+        input_dir: Directory containing the SERP HTML files
+        job_dir: Directory on shared storage holding the queue and outputs
+        num_shards: Number of shards to split the inputs into
+
+    Returns:
+        Number of shards in the job
+    """
+    os.makedirs(os.path.join(job_dir, OUTPUT_DIR), exist_ok=True)
+    connection = _connect(job_dir)
+    try:
+        connection.executescript(_SCHEMA)
+        connection.execute("BEGIN IMMEDIATE")
+        existing = connection.execute("SELECT COUNT(*) FROM shards").fetchone()[0]
+        if existing:
+            connection.execute("ROLLBACK")
+            return existing
+
+        shards: List[List[str]] = [[] for _ in range(num_shards)]
+        for root, _, filenames in os.walk(input_dir):
+            for filename in filenames:
+                if filename.endswith(".html"):
+                    name = os.path.relpath(os.path.join(root, filename), input_dir)
+                    shards[shard_of(name, num_shards)].append(name)
+
+        connection.executemany(
+            "INSERT INTO shards (id, files) VALUES (?, ?)",
+            [(i, json.dumps(sorted(files))) for i, files in enumerate(shards)],
+        )
+        connection.execute("INSERT INTO job (key, value) VALUES ('input_dir', ?)", (os.path.abspath(input_dir),))
+        connection.execute("COMMIT")
+        return num_shards
+    finally:
+        connection.close()
+
+
+def claim_shard(connection: sqlite3.Connection, worker_id: str,
+                lease_seconds: float, max_attempts: int) -> Optional[sqlite3.Row]:
+    """
+    Lease the next pending shard, or a running shard whose lease expired
+
+    Expired shards that already used all their attempts (their worker died
+    on the last one) are marked failed in the same transaction.
+
+    Args:
+        connection: Open queue connection
+        worker_id: Identifier of the claiming worker
+        lease_seconds: Lease duration (renewed by heartbeats)
+        max_attempts: Shards are not handed out more often than this
+
+    Returns:
+        The claimed shard row, or None when there is nothing left to claim
+    """
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute(
+            "UPDATE shards SET status = 'failed', lease_expires = NULL, "
+            "error = COALESCE(error, 'lease expired on the last attempt') "
+            "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+            (now, max_attempts),
+        )
+        row = connection.execute(
+            "SELECT * FROM shards WHERE attempts < ? AND "
+            "(status = 'pending' OR (status = 'running' AND lease_expires < ?)) "
+            "ORDER BY id LIMIT 1",
+            (max_attempts, now),
+        ).fetchone()
+        if row is not None:
+            connection.execute(
+                "UPDATE shards SET status = 'running', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (worker_id, now + lease_seconds, row["id"]),
+            )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return row
+
+
+def heartbeat(connection: sqlite3.Connection, shard_id: int, worker_id: str, lease_seconds: float) -> bool:
+    """Extend the lease of a shard; return False if the worker no longer owns it"""
+    cursor = connection.execute(
+        "UPDATE shards SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'running'",
+        (time.time() + lease_seconds, shard_id, worker_id),
+    )
+    return cursor.rowcount == 1
+
+
+def _finish_shard(connection: sqlite3.Connection, shard_id: int, worker_id: str,
+                  status: str, output: Optional[str] = None, error: Optional[str] = None,
+                  failed_files: Optional[Dict[str, str]] = None) -> bool:
+    cursor = connection.execute(
+        "UPDATE shards SET status = ?, output = ?, error = ?, failed_files = ?, lease_expires = NULL "
+        "WHERE id = ? AND owner = ? AND status = 'running'",
+        (status, output, error, json.dumps(failed_files) if failed_files else None, shard_id, worker_id),
+    )
+    return cursor.rowcount == 1
+
+
+def _process_shard(input_dir: str, job_dir: str, shard: sqlite3.Row, worker_id: str,
+                   lease_lost: threading.Event) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    Extract every file of a shard into <job_dir>/shards/shard-NNNNN.jsonl
+
+    Output is written to a worker-private temporary file and moved into place
+    atomically, so re-running a shard simply replaces its output. The
+    temporary file is removed if the shard is abandoned or fails.
+
+    A file that cannot be extracted gets a {"file": ..., "error": ...} record
+    instead of a {"file": ..., "serp": ...} one; the rest of the shard goes on.
+
+    Returns:
+        Tuple of (output path relative to job_dir, error per failed file), or
+        None if the lease was lost
+    """
+    output = os.path.join(OUTPUT_DIR, f"shard-{shard['id']:05d}.jsonl")
+    path = os.path.join(job_dir, output)
+    temporary_path = f"{path}.{worker_id}.tmp"
+    failed_files: Dict[str, str] = {}
+    try:
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            for name in json.loads(shard["files"]):
+                if lease_lost.is_set():
+                    return None
+                try:
+                    with open(os.path.join(input_dir, name), 'r', encoding='utf-8', errors='ignore') as html_file:
+                        record = {"file": name, "serp": extract_serp(html_file.read())}
+                except Exception as e:
+                    failed_files[name] = repr(e)
+                    record = {"file": name, "error": repr(e)}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if lease_lost.is_set():
+            return None
+        os.replace(temporary_path, path)
+        return output, failed_files
+    finally:
+        # Left behind only when the shard was abandoned or failed
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def run_worker(job_dir: str, worker_id: Optional[str] = None,
+               lease_seconds: float = 60.0, max_attempts: int = 3) -> int:
+    """
+    Claim and process shards until the queue has nothing left to hand out
+
+    Several workers (processes or nodes sharing job_dir) can run at once. A
+    background thread renews the lease while a shard is processed; shards of
+    workers that die are handed out again once their lease expires.
+
+    Args:
+        job_dir: Job directory created by plan_job
+        worker_id: Unique worker name (defaults to host:pid)
+        lease_seconds: Lease duration, renewed every third of it
+        max_attempts: Number of times a shard is tried before it is marked failed
+
+    Returns:
+        Number of shards completed by this worker
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    connection = _connect(job_dir)
+    input_dir = connection.execute("SELECT value FROM job WHERE key = 'input_dir'").fetchone()[0]
+    completed = 0
+    try:
+        while True:
+            shard = claim_shard(connection, worker_id, lease_seconds, max_attempts)
+            if shard is None:
+                return completed
+
+            lease_lost = threading.Event()
+            stop = threading.Event()
+
+            def keep_alive():
+                beat_connection = _connect(job_dir)
+                try:
+                    while not stop.wait(lease_seconds / 3):
+                        if not heartbeat(beat_connection, shard["id"], worker_id, lease_seconds):
+                            lease_lost.set()
+                            return
+                finally:
+                    beat_connection.close()
+
+            beater = threading.Thread(target=keep_alive, daemon=True)
+            beater.start()
+            try:
+                output = _process_shard(input_dir, job_dir, shard, worker_id, lease_lost)
+            except Exception as e:
+                status = 'failed' if shard["attempts"] + 1 >= max_attempts else 'pending'
+                _finish_shard(connection, shard["id"], worker_id, status, error=repr(e))
+                continue
+            finally:
+                stop.set()
+                beater.join()
+
+            if output is not None and _finish_shard(connection, shard["id"], worker_id, 'done',
+                                                    output=output[0], failed_files=output[1]):
+                completed += 1
+    finally:
+        connection.close()
+
+
+def write_manifest(job_dir: str) -> Dict[str, Any]:
+    """
+    Write <job_dir>/manifest.json describing every shard and its output
+
+    Args:
+        job_dir: Job directory created by plan_job
+
+    Returns:
+        The manifest
+    """
+    connection = _connect(job_dir)
+    try:
+        rows = connection.execute("SELECT * FROM shards ORDER BY id").fetchall()
+        input_dir = connection.execute("SELECT value FROM job WHERE key = 'input_dir'").fetchone()[0]
+    finally:
+        connection.close()
+
+    manifest = {
+        "input_dir": input_dir,
+        "num_shards": len(rows),
+        "complete": all(row["status"] == 'done' for row in rows),
+        "failed_files": sum(len(json.loads(row["failed_files"] or "{}")) for row in rows),
+        "shards": [
+            {
+                "id": row["id"],
+                "status": row["status"],
+                "files": json.loads(row["files"]),
+                "output": row["output"],
+                "attempts": row["attempts"],
+                "error": row["error"],
+                "failed_files": json.loads(row["failed_files"] or "{}"),
+            }
+            for row in rows
+        ],
+    }
+    temporary_path = os.path.join(job_dir, f"{MANIFEST_FILE}.tmp")
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary_path, os.path.join(job_dir, MANIFEST_FILE))
+    return manifest
+
+
+def run_local(input_dir: str, job_dir: str, num_shards: int, workers: int,
+              lease_seconds: float = 60.0) -> Dict[str, Any]:
+    """
+    Run a whole job on this machine, with worker processes standing in for nodes
+
+    Args:
+        input_dir: Directory containing the SERP HTML files
+        job_dir: Directory holding the queue and outputs
+        num_shards: Number of shards to split the inputs into
+        workers: Number of worker processes
+        lease_seconds: Shard lease duration
+
+    Returns:
+        The job manifest
+    """
+    plan_job(input_dir, job_dir, num_shards)
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(job_dir, f"local-{i}", lease_seconds))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return write_manifest(job_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded SERP to JSON batch runner")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = subparsers.add_parser("plan", help="split inputs into shards")
+    plan_parser.add_argument("input_dir")
+    plan_parser.add_argument("job_dir")
+    plan_parser.add_argument("--shards", type=int, default=64)
+
+    work_parser = subparsers.add_parser("work", help="process shards until none are left")
+    work_parser.add_argument("job_dir")
+    work_parser.add_argument("--worker-id")
+    work_parser.add_argument("--lease", type=float, default=60.0)
+
+    manifest_parser = subparsers.add_parser("manifest", help="write the job manifest")
+    manifest_parser.add_argument("job_dir")
+
+    local_parser = subparsers.add_parser("local", help="plan and run a job with local worker processes")
+    local_parser.add_argument("input_dir")
+    local_parser.add_argument("job_dir")
+    local_parser.add_argument("--shards", type=int, default=64)
+    local_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    args = parser.parse_args()
+    if args.command == "plan":
+        print(f"Planned {plan_job(args.input_dir, args.job_dir, args.shards)} shards")
+    elif args.command == "work":
+        print(f"Completed {run_worker(args.job_dir, args.worker_id, args.lease)} shards")
+    elif args.command == "manifest":
+        manifest = write_manifest(args.job_dir)
+        print(f"Manifest written ({'complete' if manifest['complete'] else 'incomplete'})")
+    else:
+        manifest = run_local(args.input_dir, args.job_dir, args.shards, args.workers)
+        print(f"Manifest written ({'complete' if manifest['complete'] else 'incomplete'})")
@@ -0,0 +1,207 @@
+from html.parser import HTMLParser
+from typing import Any, Dict, IO, List, Optional, Union
+
+from lxml import etree
+
+from modules.limits import VOID_ELEMENTS
+
+# Read file inputs in chunks of this many characters
+CHUNK_SIZE = 65536
+
+# Elements whose text get_text() leaves out
+_NON_TEXT_ELEMENTS = frozenset(['script', 'style'])
+
+# Fields captured per result, as (tag, required classes) alternatives in
+# the same order as the selectors of extract_organic_results
+_FIELD_SELECTORS = {
+    "title": [("h3", ()), ("div", ("F0FGWb",)), ("div", ("ynAwRc",)), ("div", ("MBeuO",)), ("div", ("v7jaNc",))],
+    "source": [("span", ("VuuXrf",)), ("span", ("pKWwCd",)), ("div", ("GkAmnd",)), ("div", ("ZaCDgb",))],
+    "displayed_link": [("cite", ("qLRx3b", "tjvcx")), ("span", ("nC62wb", "VndCse", "z8gr9e"))],
+    "snippet": [("div", ("VwiC3b",)), ("div", ("tZESfb",))],
+}
+_RESULT_CLASSES = frozenset(["vt6azd", "Ww4FFb"])
+
+
+def _matches(tag: str, classes: frozenset, alternatives) -> bool:
+    for selector_tag, selector_classes in alternatives:
+        if tag == selector_tag and classes.issuperset(selector_classes):
+            return True
+    return False
+
+
+class _OrganicCollector:
+    """
+    Collect organic results from start/end/data events without building a tree
+
+    Only the open-element stack and the fields of the current result are kept,
+    so memory does not grow with the size of the page.
+    """
+
+    def __init__(self):
+        self.stack: List[str] = []
+        self.text: List[str] = []
+        self.rso_depth: Optional[int] = None
+        self.rso_done = False
+        self.result_depth: Optional[int] = None
+        self.fields: Dict[str, Any] = {}
+        self.captures: Dict[int, List[str]] = {}
+        self.skip_depth: Optional[int] = None
+        self.results: List[Dict[str, Any]] = []
+        self.elements = 0
+
+    def _flush_text(self) -> None:
+        """Add the pending text node (stripped, as get_text does) to open captures"""
+        if not self.text:
+            return
+        text = ''.join(self.text).strip()
+        self.text = []
+        if text and self.skip_depth is None:
+            for field_names in self.captures.values():
+                for field in field_names:
+                    self.fields[field].append(text)
+
+    def start(self, tag: str, attrs: Dict[str, Optional[str]]) -> None:
+        self._flush_text()
+        self.elements += 1
+        self.stack.append(tag)
+        depth = len(self.stack)
+
+        if tag in _NON_TEXT_ELEMENTS and self.skip_depth is None:
+            self.skip_depth = depth
+
+        if self.rso_depth is None:
+            if not self.rso_done and attrs.get('id') == 'rso':
+                self.rso_depth = depth
+        elif self.result_depth is None:
+            if tag == 'div' and _RESULT_CLASSES.issubset((attrs.get('class') or '').split()):
+                self.result_depth = depth
+                self.fields = {}
+        else:
+            if tag == 'a' and "link" not in self.fields:
+                self.fields["link"] = attrs.get('href') or ""
+            classes = frozenset((attrs.get('class') or '').split())
+            for field, alternatives in _FIELD_SELECTORS.items():
+                if field not in self.fields and _matches(tag, classes, alternatives):
+                    self.fields[field] = []
+                    self.captures.setdefault(depth, []).append(field)
+
+        if tag in VOID_ELEMENTS:
+            self._pop()
+
+    def end(self, tag: str) -> None:
+        self._flush_text()
+        if tag in VOID_ELEMENTS or tag not in self.stack:
+            return
+        while self.stack and self._pop() != tag:
+            pass
+
+    def data(self, text: str) -> None:
+        self.text.append(text)
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._flush_text()
+        while self.stack:
+            self._pop()
+        return self.results
+
+    def _pop(self) -> str:
+        depth = len(self.stack)
+        tag = self.stack.pop()
+        self.captures.pop(depth, None)
+        if depth == self.skip_depth:
+            self.skip_depth = None
+        if depth == self.result_depth:
+            self.result_depth = None
+            self._add_result()
+        elif depth == self.rso_depth:
+            self.rso_depth = None
+            self.rso_done = True
+        return tag
+
+    def _add_result(self) -> None:
+        fields = self.fields
+        self.captures = {}
+        source = ''.join(fields.get("source") or [])
+        title = ''.join(fields.get("title") or [])
+        link = fields.get("link") or ""
+        if source and title and link:
+            self.results.append({
+                "position": len(self.results) + 1,
+                "title": title,
+                "link": link,
+                "displayed_link": ''.join(fields.get("displayed_link") or []),
+                "snippet": ''.join(fields.get("snippet") or []),
+            })
+
+
+class _HTMLParserEvents(HTMLParser):
+    """Feed html.parser tokens (the tokenizer BeautifulSoup uses) to a collector"""
+
+    def __init__(self, collector: _OrganicCollector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        # Later duplicates win, as in BeautifulSoup
+        self.collector.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class _LxmlTarget:
+    """Adapt lxml parser target callbacks to a collector"""
+
+    def __init__(self, collector: _OrganicCollector):
+        self.collector = collector
+        self.start = collector.start
+        self.end = collector.end
+        self.data = collector.data
+
+    def close(self):
+        return self.collector.close()
+
+
+def stream_organic_results(source: Union[str, IO[str]], parser: str = "html.parser") -> List[Dict[str, Any]]:
+    """
+    Extract organic results from a SERP without building a document tree
+
+    A lighter alternative to extract_organic_results for jobs that only need
+    position, title, link, displayed_link and snippet. The page is tokenized
+    in chunks and results are collected from parser events, so memory stays
+    flat regardless of page size.
+
+    Args:
+        source: HTML content of the SERP page, or a text file object
+        parser: "html.parser" (same tokenizer as extract_serp) or "lxml" (faster)
+
+    Returns:
+        List of organic results
+    """
+    collector = _OrganicCollector()
+    if parser == "html.parser":
+        events = _HTMLParserEvents(collector)
+        feed, close = events.feed, events.close
+    elif parser == "lxml":
+        events = etree.HTMLParser(target=_LxmlTarget(collector))
+        feed, close = events.feed, events.close
+    else:
+        raise ValueError(f"unknown parser: {parser}")
+
+    if isinstance(source, str):
+        for i in range(0, len(source), CHUNK_SIZE):
+            feed(source[i:i + CHUNK_SIZE])
+    else:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), ''):
+            feed(chunk)
+    try:
+        close()
+    except etree.XMLSyntaxError:
+        # lxml refuses documents without any element (e.g. empty input), which
+        # have no results; any other syntax error is a real failure
+        if collector.elements:
+            raise
+    return collector.close()
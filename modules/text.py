@@ -0,0 +1,173 @@
+import gc
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, Tuple
+
+from bs4.element import CData, NavigableString, Tag
+
+# Attribute under which a node's stripped text is cached on the node itself,
+# so the cache lives exactly as long as the parsed tree
+_CACHE_ATTRIBUTE = '_serp_text'
+
+_DEFAULT_STRING_TYPES = frozenset([NavigableString, CData])
+
+_interning = True
+
+
+def set_interning(enabled: bool) -> None:
+    """Enable or disable string interning (mainly for benchmarking)"""
+    global _interning
+    _interning = enabled
+
+
+def intern_text(text: Optional[str]) -> Optional[str]:
+    """
+    Return a shared copy of a frequently repeated string
+
+    Values such as sources and dates repeat across the
+    results of a batch; interning keeps one copy alive instead of one per
+    result. Only use it for such low-cardinality values: interned strings may
+    live as long as the process (they are immortal on CPython 3.12+).
+
+    Args:
+        text: String to intern (None and empty strings are returned as is)
+
+    Returns:
+        The interned plain str
+    """
+    if not text or not _interning:
+        return None if text is None else str(text)
+    return sys.intern(str(text))
+
+
+def _string_types(node: Tag):
+    return node.interesting_string_types or _DEFAULT_STRING_TYPES
+
+
+def node_text(node: Tag) -> str:
+    """
+    Return node.get_text(strip=True), computed once per node
+
+    Args:
+        node: Element to get the text of
+
+    Returns:
+        The stripped strings of the node joined together
+    """
+    cached = node.__dict__.get(_CACHE_ATTRIBUTE)
+    if cached is None:
+        types = _string_types(node)
+        cached = ''.join(
+            text for text in (
+                descendant.strip() for descendant in node.descendants
+                if type(descendant) in types
+            ) if text
+        )
+        node.__dict__[_CACHE_ATTRIBUTE] = cached
+    return cached
+
+
+def clear_text_cache(node: Tag) -> None:
+    """Drop the texts cached by node_text on node and its descendants"""
+    node.__dict__.pop(_CACHE_ATTRIBUTE, None)
+    for descendant in node.descendants:
+        if isinstance(descendant, Tag):
+            descendant.__dict__.pop(_CACHE_ATTRIBUTE, None)
+
+
+def text_with_highlights(node: Tag, highlight: str = 'em') -> Tuple[str, List[str]]:
+    """
+    Return a node's text and the text of its highlight elements in one pass
+
+    Equivalent to (node.get_text(strip=True),
+    [em.get_text(strip=True) for em in node.select('em')]) without walking the
+    highlighted elements a second time.
+
+    Args:
+        node: Element to get the text of
+        highlight: Tag name of highlighted words
+
+    Returns:
+        Tuple of (text, highlighted words)
+    """
+    types = _string_types(node)
+    parts = []
+    highlights: List[List[str]] = []
+    highlight_index = {}
+    for descendant in node.descendants:
+        if isinstance(descendant, Tag):
+            if descendant.name == highlight:
+                highlight_index[id(descendant)] = len(highlights)
+                highlights.append([])
+            continue
+        if type(descendant) not in types:
+            continue
+        text = descendant.strip()
+        if not text:
+            continue
+        parts.append(text)
+        if highlights:
+            parent = descendant.parent
+            while parent is not None and parent is not node:
+                if parent.name == highlight:
+                    highlights[highlight_index[id(parent)]].append(text)
+                parent = parent.parent
+
+    text = ''.join(parts)
+    node.__dict__[_CACHE_ATTRIBUTE] = text
+    return text, [''.join(words) for words in highlights]
+
+
+def benchmark(pages: List[str]) -> dict:
+    """
+    Measure memory retained by a batch of extracted SERPs with and without interning
+
+    Each page is extracted once, so only strings that really repeat across
+    distinct pages are shared; pass many different pages for a meaningful
+    figure.
+
+    Args:
+        pages: Distinct HTML pages to extract
+
+    Returns:
+        Retained bytes and extraction time for both settings
+    """
+    from modules.html_to_json import extract_serp
+
+    for html_content in pages:  # Warm up imports and caches outside the measurement
+        extract_serp(html_content, stats={})
+    report = {}
+    for enabled in (False, True):
+        set_interning(enabled)
+        tracemalloc.start()
+        started = time.perf_counter()
+        batch = [extract_serp(html_content, stats={}) for html_content in pages]
+        seconds = time.perf_counter() - started
+        gc.collect()  # Parsed trees are cyclic; only count what the batch keeps alive
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report["interned" if enabled else "plain"] = {"retained_bytes": retained, "seconds": seconds,
+                                                      "pages": len(batch)}
+        del batch
+    set_interning(True)
+    report["retained_reduction"] = 1 - report["interned"]["retained_bytes"] / report["plain"]["retained_bytes"]
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from modules.regression import DEFAULT_CORPUS, load_corpus
+
+    parser = argparse.ArgumentParser(description="Benchmark string interning on distinct SERP pages")
+    parser.add_argument("pages", nargs="*", help="HTML pages to extract (defaults to the fixture corpus)")
+    args = parser.parse_args()
+    if args.pages:
+        html_pages = []
+        for path in args.pages:
+            with open(path, 'r', encoding='utf-8') as f:
+                html_pages.append(f.read())
+    else:
+        html_pages = list(load_corpus(DEFAULT_CORPUS).values())
+    print(json.dumps(benchmark(html_pages), indent=2))
@@ -0,0 +1,116 @@
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional
+from urllib.parse import unquote_plus
+
+from modules.metrics import REGISTRY
+
+GOOGLE_ORIGIN = "https://www.google.com"
+
+# The same URLs and domains repeat across pages, so a bounded cache pays off
+URL_CACHE_SIZE = 65536
+
+_REDIRECT_TARGET = re.compile(r'[?&](?:q|url)=([^&#]+)')
+# Names of tracking query parameters (matched against the whole name only)
+_TRACKING_PARAM = re.compile(
+    r'^(?:utm_\w+|ref|ref_?src|trk|track(?:ing)?(?:_?id)?|click_?id|[a-z]*clid|msclkid)$',
+    re.IGNORECASE,
+)
+_HOST = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*://(?:[^@/?#]*@)?([^/?#:]+)')
+
+
+def is_google_redirect(href: str) -> bool:
+    """Return True for Google redirect links such as /url?q=..."""
+    return href.startswith('/url?') or ('google' in href and 'url=' in href)
+
+
+def resolve_redirect(href: str) -> str:
+    """
+    Return the target of a Google redirect link, or href itself
+
+    Args:
+        href: Link as found in the page
+
+    Returns:
+        The decoded q= / url= target for redirect links, href otherwise
+    """
+    if is_google_redirect(href):
+        match = _REDIRECT_TARGET.search(href)
+        if match:
+            return unquote_plus(match.group(1))
+    return href
+
+
+def strip_tracking_params(url: str) -> str:
+    """
+    Remove tracking query parameters (utm_*, ref, gclid, ...) from a URL
+
+    Only parameter names are matched, so values such as q=trackpad are kept.
+
+    Args:
+        url: URL to clean
+
+    Returns:
+        The URL without tracking parameters (and without an empty query)
+    """
+    if '?' not in url:
+        return url
+    url, hash_mark, fragment = url.partition('#')
+    base, _, query = url.partition('?')
+    params = [p for p in query.split('&') if p and not _TRACKING_PARAM.match(p.partition('=')[0])]
+    url = base + '?' + '&'.join(params) if params else base
+    return url + hash_mark + fragment
+
+
+def google_url(path: str) -> str:
+    """Make a Google-relative path (e.g. a ping attribute) absolute"""
+    return GOOGLE_ORIGIN + path
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def normalize_url(url: str) -> str:
+    """
+    Resolve Google redirects and strip tracking parameters from a URL
+
+    Args:
+        url: Link as found in the page
+
+    Returns:
+        The normalized URL
+    """
+    return strip_tracking_params(resolve_redirect(url))
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def url_domain(url: str) -> Optional[str]:
+    """
+    Return the lowercased host of a URL without a leading www.
+
+    Google redirect links are resolved first, so /url?q=https://example.com/
+    gives example.com.
+
+    Args:
+        url: Absolute URL or Google redirect link
+
+    Returns:
+        The normalized domain, or None for relative URLs
+    """
+    match = _HOST.match(resolve_redirect(url))
+    if not match:
+        return None
+    host = match.group(1).lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def normalize_urls(urls: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """Normalize a batch of URLs (empty values are passed through)"""
+    return [normalize_url(url) if url else url for url in urls]
+
+
+def url_domains(urls: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """Return the normalized domain of a batch of URLs (None for empty values)"""
+    return [url_domain(url) if url else None for url in urls]
+
+
+REGISTRY.register_cache("normalize_url", normalize_url)
+REGISTRY.register_cache("url_domain", url_domain)
@@ -0,0 +1,39 @@
+import re
+
+from modules.dedup import find_duplicates
+from modules.regression import DEFAULT_CORPUS, load_corpus
+
+PAGE = load_corpus(DEFAULT_CORPUS)["google_basic"]
+RESULT = '<div class="vt6azd Ww4FFb">'
+
+
+def swap_results(html_content, first, second):
+    head, *results = html_content.split(RESULT)
+    # The last block also carries the rest of the page
+    last, tail = results[-1].split('\n', 1)
+    results[-1] = last + '\n'
+    results[first], results[second] = results[second], results[first]
+    return head + ''.join(RESULT + result for result in results) + tail
+
+
+def test_volatile_changes_are_merged():
+    copy = re.sub(r'utm_source=x', 'utm_source=y', PAGE)
+    assert find_duplicates([("a", PAGE), ("b", copy)]) == {"a": "a", "b": "a"}
+
+
+def test_reordered_results_are_not_merged():
+    reordered = swap_results(PAGE, 0, 2)
+    assert reordered != PAGE
+    assert find_duplicates([("a", PAGE), ("b", reordered)]) == {"a": "a", "b": "b"}
+
+
+def test_other_query_is_not_merged():
+    other = PAGE.replace("<title>python - Google Search", "<title>python tutorial - Google Search")
+    assert find_duplicates([("a", PAGE), ("b", other)]) == {"a": "a", "b": "b"}
+
+
+def test_other_sections_are_not_merged():
+    other = PAGE.replace("What is Python used for?", "Who created Python?")
+    other = other.replace("Is Python easy to learn?", "Is Python free?")
+    assert other != PAGE
+    assert find_duplicates([("a", PAGE), ("b", other)]) == {"a": "a", "b": "b"}
@@ -0,0 +1,43 @@
+from dataclasses import replace
+
+from modules.limits import NO_LIMITS, PageGuard
+
+
+def prescan(html_content, **limits):
+    guard = PageGuard(replace(NO_LIMITS, **limits))
+    return guard.prescan(html_content), guard.errors
+
+
+def test_long_attribute_is_truncated():
+    html_content, errors = prescan('<div title="' + 'a' * 50 + '">x</div>', max_attr_length=10)
+    assert html_content == '<div title="aaaaaaaaaa">x</div>'
+    assert errors == ['truncated 1 attribute values longer than 10']
+
+
+def test_text_with_attribute_like_quotes_is_untouched():
+    page = '<p>x ="quote in text</p><div title="' + 'a' * 50 + '" hidden>y</div>'
+    html_content, _ = prescan(page, max_attr_length=10)
+    assert html_content == '<p>x ="quote in text</p><div title="aaaaaaaaaa" hidden>y</div>'
+
+
+def test_short_attributes_are_untouched():
+    page = "<a href='/short' data-x=\"1\">x</a>"
+    assert prescan(page, max_attr_length=10) == (page, [])
+
+
+def test_page_is_cut_at_the_node_limit():
+    html_content, errors = prescan('<p>a</p>\n<p>b</p>\n<p>c</p>', max_nodes=2)
+    assert html_content == '<p>a</p>\n<p>b</p>\n'
+    assert errors == ['page has more than 2 elements']
+
+
+def test_clean_serp_html_reports_limit_errors():
+    from modules.html_cleaner import clean_serp_html
+
+    errors = []
+    clean_serp_html('<p>a</p><p>b</p><p>c</p>', replace(NO_LIMITS, max_nodes=2), errors=errors)
+    assert errors == ['page has more than 2 elements']
+
+    errors = []
+    clean_serp_html('<p>a</p>', NO_LIMITS, errors=errors)
+    assert errors == []
@@ -0,0 +1,26 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from modules.html_to_json import extract_organic_results
+from modules.regression import DEFAULT_CORPUS, load_corpus
+from modules.stream_extract import stream_organic_results
+
+PAGES = load_corpus(DEFAULT_CORPUS)
+FIELDS = ("position", "title", "link", "displayed_link", "snippet")
+
+
+@pytest.mark.parametrize("parser", ["html.parser", "lxml"])
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_stream_matches_tree_extractor(name, parser):
+    html_content = PAGES[name]
+    rso = BeautifulSoup(html_content, 'html.parser').select_one('#rso')
+    expected = [
+        {field: result[field] for field in FIELDS}
+        for result in (extract_organic_results(rso) if rso else [])
+    ]
+    assert stream_organic_results(html_content, parser=parser) == expected
+
+
+def test_empty_input():
+    assert stream_organic_results("", parser="lxml") == []
+    assert stream_organic_results("", parser="html.parser") == []
@@ -0,0 +1,15 @@
+from modules.urls import normalize_url, url_domain
+
+
+def test_tracking_parameters_are_stripped():
+    assert normalize_url('https://a.com/?utm_source=x&ref=y&gclid=1&id=3#top') == 'https://a.com/?id=3#top'
+
+
+def test_parameters_are_matched_by_name_only():
+    assert normalize_url('https://shop.com/search?q=trackpad&page=2') == 'https://shop.com/search?q=trackpad&page=2'
+    assert normalize_url('https://a.com/?href=/x&mode=click') == 'https://a.com/?href=/x&mode=click'
+
+
+def test_google_redirects_are_resolved():
+    assert normalize_url('/url?q=https://python.org/%3Fa%3D1&sa=U') == 'https://python.org/?a=1'
+    assert url_domain('/url?q=https://www.Python.org/') == 'python.org'